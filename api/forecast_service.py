@@ -0,0 +1,204 @@
+"""
+Long-running forecast service.
+
+Keeps the Production model and each city's recent feature window in
+memory, serves the current 3-day forecast from memory, micro-batches
+concurrent scoring requests into one predict call and hot-swaps the
+model when a new version is promoted.
+
+Run with:
+    uvicorn api.forecast_service:app --host 0.0.0.0 --port 8000
+"""
+import asyncio
+import time
+from contextlib import asynccontextmanager
+import numpy as np
+import pandas as pd
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel
+from pipelines.daily_inference_pipeline import get_latest_features, predict_direct, REQUIRED_COLS
+from models.model_cache import get_production_version, load_model_version
+from config.config import (
+    CITY,
+    MODEL_NAME,
+    USE_COMPACT_PREDICTOR,
+    SERVICE_MODEL_POLL_SECONDS,
+    SERVICE_FEATURE_REFRESH_SECONDS,
+    SERVICE_BATCH_WAIT_MS,
+    SERVICE_MAX_BATCH_REQUESTS
+)
+
+CITIES = [CITY]
+
+# Everything the request handlers read. "model" is replaced as a whole
+# tuple (version, model, feature_names), so a swap is atomic for readers.
+state = {
+    "model": None,
+    "features": {},
+    "forecasts": {},
+    "features_loaded_at": {},
+    "batch_queue": None
+}
+
+class PredictRequest(BaseModel):
+    rows: list[dict]
+
+# ================== MODEL HOT-SWAP ==================
+async def refresh_model(force=False):
+    """Load the Production version if it differs from the one in memory"""
+    mv = await asyncio.to_thread(get_production_version, MODEL_NAME)
+    current = state["model"]
+    if not force and current is not None and current[0] == int(mv.version):
+        return False
+
+    model, feature_names = await asyncio.to_thread(
+        load_model_version, MODEL_NAME, mv, USE_COMPACT_PREDICTOR
+    )
+    state["model"] = (int(mv.version), model, feature_names)
+    print(f"Serving model version {mv.version}")
+    return True
+
+# ================== FEATURES & FORECASTS ==================
+async def refresh_city(city):
+    """Reload the feature window and recompute the city's forecast"""
+    version, model, feature_names = state["model"]
+    df = await asyncio.to_thread(
+        get_latest_features, feature_names + REQUIRED_COLS, city=city
+    )
+    forecast = await asyncio.to_thread(predict_direct, model, feature_names, df)
+
+    state["features"][city] = df
+    state["features_loaded_at"][city] = time.time()
+    state["forecasts"][city] = {
+        "city": city,
+        "model_version": version,
+        "issued_at": df["timestamp"].iloc[-1].isoformat(),
+        "forecast": [
+            {"date": d.date().isoformat(), "avg_aqi": round(float(a), 2)}
+            for d, a in zip(forecast["date"], forecast["avg_aqi"])
+        ]
+    }
+
+async def refresh_all_cities():
+    results = await asyncio.gather(*(refresh_city(c) for c in CITIES), return_exceptions=True)
+    for city, res in zip(CITIES, results):
+        if isinstance(res, Exception):
+            print(f"Refreshing {city} failed: {res}")
+
+async def model_poller():
+    while True:
+        await asyncio.sleep(SERVICE_MODEL_POLL_SECONDS)
+        try:
+            if await refresh_model():
+                await refresh_all_cities()
+        except Exception as e:
+            print(f"Model refresh failed: {e}")
+
+async def feature_refresher():
+    while True:
+        await asyncio.sleep(SERVICE_FEATURE_REFRESH_SECONDS)
+        await refresh_all_cities()
+
+# ================== MICRO-BATCHING ==================
+async def score(X):
+    """Queue rows for the batch worker and wait for their predictions"""
+    fut = asyncio.get_running_loop().create_future()
+    await state["batch_queue"].put((X, fut))
+    return await fut
+
+async def batch_worker():
+    """
+    Collect requests arriving within SERVICE_BATCH_WAIT_MS of the first one
+    and score them all with a single predict call.
+    """
+    loop = asyncio.get_running_loop()
+    queue = state["batch_queue"]
+
+    while True:
+        batch = [await queue.get()]
+        deadline = loop.time() + SERVICE_BATCH_WAIT_MS / 1000
+        while len(batch) < SERVICE_MAX_BATCH_REQUESTS:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        # Everything that can fail is inside the try, so the requests of the
+        # batch get the exception and the worker keeps serving
+        try:
+            version, model, feature_names = state["model"]
+            frames = [
+                X.reindex(columns=feature_names).apply(pd.to_numeric, errors="coerce")
+                for X, _ in batch
+            ]
+            bounds = np.cumsum([0] + [len(f) for f in frames])
+
+            preds = await asyncio.to_thread(model.predict, pd.concat(frames, ignore_index=True))
+            preds = np.clip(np.asarray(preds), 0, None)
+            for (_, fut), lo, hi in zip(batch, bounds[:-1], bounds[1:]):
+                if not fut.done():
+                    fut.set_result((version, preds[lo:hi]))
+        except Exception as e:
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+
+# ================== APP ==================
+@asynccontextmanager
+async def lifespan(app):
+    state["batch_queue"] = asyncio.Queue()
+    await refresh_model(force=True)
+    await refresh_all_cities()
+
+    tasks = [
+        asyncio.create_task(batch_worker()),
+        asyncio.create_task(model_poller()),
+        asyncio.create_task(feature_refresher())
+    ]
+    yield
+    for t in tasks:
+        t.cancel()
+
+app = FastAPI(title="AQI Forecast Service", lifespan=lifespan)
+
+@app.get("/health")
+async def health():
+    version = state["model"][0] if state["model"] else None
+    return {
+        "model_version": version,
+        "cities": {
+            c: round(time.time() - t, 1) for c, t in state["features_loaded_at"].items()
+        }
+    }
+
+@app.get("/forecast/{city}")
+async def forecast(city: str):
+    """Current 3-day forecast, served from memory"""
+    if city not in state["forecasts"]:
+        raise HTTPException(status_code=404, detail=f"No forecast for {city}")
+    return state["forecasts"][city]
+
+@app.post("/predict")
+async def predict(req: PredictRequest):
+    """Score raw feature rows; concurrent calls share one predict()"""
+    if not req.rows:
+        raise HTTPException(status_code=400, detail="No rows to score")
+    version, preds = await score(pd.DataFrame(req.rows))
+    return {
+        "model_version": version,
+        "predictions": [
+            {"aqi_t_plus_24": p[0], "aqi_t_plus_48": p[1], "aqi_t_plus_72": p[2]}
+            for p in preds.tolist()
+        ]
+    }
+
+@app.post("/reload")
+async def reload():
+    """Check for a newly promoted model now instead of waiting for the poller"""
+    swapped = await refresh_model()
+    if swapped:
+        await refresh_all_cities()
+    return {"swapped": swapped, "model_version": state["model"][0]}
@@ -0,0 +1,60 @@
+"""
+Local load test for the forecast service.
+
+    python -m api.load_test --url http://localhost:8000 --requests 2000 --concurrency 32
+
+Hits /forecast/{city} and /predict concurrently and reports p50/p99 latency.
+"""
+import argparse
+import json
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from config.config import CITY
+
+def _request(url, payload=None):
+    data = json.dumps(payload).encode() if payload is not None else None
+    req = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+    start = time.perf_counter()
+    with urllib.request.urlopen(req) as res:
+        res.read()
+    return (time.perf_counter() - start) * 1000
+
+def run_load_test(base_url, n_requests, concurrency, city=CITY, rows_per_predict=1):
+    forecast_url = f"{base_url}/forecast/{city}"
+
+    # Empty rows: every feature is missing and gets imputed by the model,
+    # which exercises the same predict path as real rows
+    payload = {"rows": [{} for _ in range(rows_per_predict)]}
+
+    def one(i):
+        if i % 2 == 0:
+            return "forecast", _request(forecast_url)
+        return "predict", _request(f"{base_url}/predict", payload)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(n_requests)))
+    elapsed = time.perf_counter() - started
+
+    print(f"{n_requests} requests, concurrency {concurrency}, {n_requests / elapsed:.0f} req/s")
+    for endpoint in ["forecast", "predict"]:
+        lat = np.array([ms for e, ms in results if e == endpoint])
+        print(
+            f"  {endpoint:<9} n={len(lat):<6} "
+            f"p50={np.percentile(lat, 50):7.2f} ms  "
+            f"p99={np.percentile(lat, 99):7.2f} ms  "
+            f"max={lat.max():7.2f} ms"
+        )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Forecast service load test")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--city", default=CITY)
+    parser.add_argument("--rows", type=int, default=1, help="rows per /predict call")
+    args = parser.parse_args()
+
+    run_load_test(args.url, args.requests, args.concurrency, args.city, args.rows)
@@ -0,0 +1,35 @@
+"""
+City registry.
+
+CITIES_FILE is a JSON list of {"name", "lat", "lon"}. CITY / LAT / LON
+stay the default city; it is added to the registry if the file does not
+list it, so single-city setups need no file at all.
+"""
+import json
+import os
+from config.config import CITY, LAT, LON, CITIES_FILE
+
+def load_cities():
+    cities = []
+    if os.path.exists(CITIES_FILE):
+        with open(CITIES_FILE) as f:
+            cities = [
+                {"name": c["name"], "lat": float(c["lat"]), "lon": float(c["lon"])}
+                for c in json.load(f)
+            ]
+
+    if CITY not in {c["name"] for c in cities}:
+        cities.insert(0, {"name": CITY, "lat": LAT, "lon": LON})
+    return cities
+
+def get_city(name=CITY):
+    for c in load_cities():
+        if c["name"] == name:
+            return c
+    raise ValueError(f"Unknown city {name!r}; add it to {CITIES_FILE}")
+
+def select_cities(names=None):
+    """Registry entries for the given names, or every registered city"""
+    if not names:
+        return load_cities()
+    return [get_city(n) for n in names]
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -21,3 +22,125 @@ MONGO_COLLECTION = os.getenv("MONGO_COLLECTION")
 MLFLOW_TRACKING_URI = os.getenv("MLFLOW_TRACKING_URI")
 MLFLOW_TRACKING_USERNAME = os.getenv("MLFLOW_TRACKING_USERNAME")
 MLFLOW_TRACKING_PASSWORD = os.getenv("MLFLOW_TRACKING_PASSWORD")
+
+# Training
+# "full" refits every model from scratch, "incremental" warm-starts the
+# boosted trainers from their current Production version
+TRAIN_MODE = os.getenv("TRAIN_MODE", "full")
+# Newest labelled hours (all cities) held out to score every candidate,
+# warm-started or refit, on the same rows
+TRAIN_HOLDOUT_HOURS = int(os.getenv("TRAIN_HOLDOUT_HOURS", 168))
+WARM_START_HOURS = int(os.getenv("WARM_START_HOURS", 48))
+WARM_START_ROUNDS = int(os.getenv("WARM_START_ROUNDS", 25))
+MAX_WARM_START_TREES = int(os.getenv("MAX_WARM_START_TREES", 600))
+FULL_REFIT_EVERY_DAYS = int(os.getenv("FULL_REFIT_EVERY_DAYS", 7))
+
+# Online model (updated on every hourly ingest)
+ONLINE_STATE_COLLECTION = os.getenv("ONLINE_STATE_COLLECTION", "online_model_state")
+ONLINE_LEARNING_RATE = float(os.getenv("ONLINE_LEARNING_RATE", 0.05))
+# 0 disables blending the online model into the daily forecast
+ONLINE_BLEND_WEIGHT = float(os.getenv("ONLINE_BLEND_WEIGHT", 0.0))
+
+# SHAP-driven feature selection
+SHAP_COLLECTION = os.getenv("SHAP_COLLECTION", "shap_importances")
+FEATURE_SELECTION_COLLECTION = os.getenv("FEATURE_SELECTION_COLLECTION", "feature_selection")
+SHAP_SAMPLE_ROWS = int(os.getenv("SHAP_SAMPLE_ROWS", 5000))
+SHAP_BATCH_SIZE = int(os.getenv("SHAP_BATCH_SIZE", 1000))
+SHAP_WORKERS = int(os.getenv("SHAP_WORKERS", 4))
+FEATURE_RMSE_TOLERANCE = float(os.getenv("FEATURE_RMSE_TOLERANCE", 0.02))
+# Skip computing lags/rolling windows the selected feature set doesn't use
+PRUNE_UPSTREAM_FEATURES = os.getenv("PRUNE_UPSTREAM_FEATURES", "false").lower() == "true"
+
+# MLflow logging: "full" logs and registers every candidate in turn, "fast"
+# uploads/registers them in the background while the next ones train
+MLFLOW_LOG_MODE = os.getenv("MLFLOW_LOG_MODE", "full")
+SIGNATURE_SAMPLE_ROWS = int(os.getenv("SIGNATURE_SAMPLE_ROWS", 100))
+
+# Compact NumPy predictor exported at promotion time
+COMPACT_PREDICTOR_PATH = "compact/predictor.npz"
+USE_COMPACT_PREDICTOR = os.getenv("USE_COMPACT_PREDICTOR", "true").lower() == "true"
+
+# Local model cache used by inference
+MODEL_CACHE_DIR = os.getenv("MODEL_CACHE_DIR", ".model_cache")
+MODEL_CACHE_KEEP = int(os.getenv("MODEL_CACHE_KEEP", 3))
+PRODUCTION_ALIAS = "production"
+
+# Inference: "direct" scores the latest feature row(s) once per horizon,
+# "rollout" scores 72 synthetic future rows built from the weather forecast
+INFERENCE_MODE = os.getenv("INFERENCE_MODE", "direct")
+DIRECT_SMOOTH_ROWS = int(os.getenv("DIRECT_SMOOTH_ROWS", 1))
+# Rows fetched (newest first) to find the latest complete feature row
+INFERENCE_WINDOW_ROWS = int(os.getenv("INFERENCE_WINDOW_ROWS", 48))
+
+# Forecast service (api/forecast_service.py)
+SERVICE_MODEL_POLL_SECONDS = int(os.getenv("SERVICE_MODEL_POLL_SECONDS", 60))
+SERVICE_FEATURE_REFRESH_SECONDS = int(os.getenv("SERVICE_FEATURE_REFRESH_SECONDS", 300))
+SERVICE_BATCH_WAIT_MS = float(os.getenv("SERVICE_BATCH_WAIT_MS", 5))
+SERVICE_MAX_BATCH_REQUESTS = int(os.getenv("SERVICE_MAX_BATCH_REQUESTS", 64))
+
+# Idempotent forecast store, one doc per (city, date, model_version, issued hour)
+FORECASTS_COLLECTION = os.getenv("FORECASTS_COLLECTION", "aqi_forecasts")
+FORECAST_RETENTION_DAYS = int(os.getenv("FORECAST_RETENTION_DAYS", 90))
+# Superseded forecasts are kept just long enough to score against actuals
+SUPERSEDED_RETENTION_DAYS = int(os.getenv("SUPERSEDED_RETENTION_DAYS", 2))
+
+# Cities scored together by the daily inference run (comma separated)
+INFERENCE_CITIES = [c.strip() for c in os.getenv("INFERENCE_CITIES", CITY).split(",") if c.strip()]
+
+# Historical backtesting (pipelines/backtest_pipeline.py)
+BACKTEST_COLLECTION = os.getenv("BACKTEST_COLLECTION", "backtest_results")
+BACKTEST_WORKERS = int(os.getenv("BACKTEST_WORKERS", 4))
+BACKTEST_BATCH_ROWS = int(os.getenv("BACKTEST_BATCH_ROWS", 50000))
+
+# Forecast-vs-actual accuracy monitor (runs after hourly ingestion)
+ACCURACY_COLLECTION = os.getenv("ACCURACY_COLLECTION", "forecast_accuracy")
+ACCURACY_DAYS_COLLECTION = os.getenv("ACCURACY_DAYS_COLLECTION", "forecast_accuracy_days")
+# A completed day needs this many hourly actuals to be scored
+ACCURACY_MIN_HOURS = int(os.getenv("ACCURACY_MIN_HOURS", 18))
+# How far back the first run looks for completed days
+ACCURACY_LOOKBACK_DAYS = int(os.getenv("ACCURACY_LOOKBACK_DAYS", 3))
+
+# Per-stage timing / metrics (monitoring/metrics.py)
+PIPELINE_METRICS = os.getenv("PIPELINE_METRICS", "false").lower() == "true"
+METRICS_DIR = os.getenv("METRICS_DIR", "reports")
+
+# On-demand profiling of pipeline entry points: "cpu", "mem" or "cpu,mem"
+PIPELINE_PROFILE = os.getenv("PIPELINE_PROFILE", "")
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_SAMPLE_MS = float(os.getenv("PROFILE_SAMPLE_MS", 5))
+PROFILE_TOP_N = int(os.getenv("PROFILE_TOP_N", 25))
+PROFILE_TRACE_FRAMES = int(os.getenv("PROFILE_TRACE_FRAMES", 1))
+
+# Per-city dashboard snapshot published by ingest / inference
+DASHBOARD_COLLECTION = os.getenv("DASHBOARD_COLLECTION", "dashboard_snapshots")
+DASHBOARD_HISTORY_DAYS = int(os.getenv("DASHBOARD_HISTORY_DAYS", 7))
+
+# Multi-resolution AQI rollups behind the long-range history chart
+ROLLUPS_COLLECTION = os.getenv("ROLLUPS_COLLECTION", "aqi_rollups")
+
+# Extra trainers for models/registry.py: "name=package.module:function,..."
+TRAINER_PLUGINS = os.getenv("TRAINER_PLUGINS", "")
+
+# City registry (config/cities.py) and the multi-city scheduler (pipelines/scheduler.py)
+CITIES_FILE = os.getenv("CITIES_FILE", os.path.join(os.path.dirname(__file__), "cities.json"))
+SCHEDULER_WORKERS = int(os.getenv("SCHEDULER_WORKERS", 8))
+# Cities per run_inference call; each call loads features for its cities and predicts once
+INFERENCE_CHUNK_SIZE = int(os.getenv("INFERENCE_CHUNK_SIZE", 10))
+# Per-provider request budgets, shared by every city in the process
+OPENWEATHER_CALLS_PER_MINUTE = int(os.getenv("OPENWEATHER_CALLS_PER_MINUTE", 60))
+OPEN_METEO_CALLS_PER_MINUTE = int(os.getenv("OPEN_METEO_CALLS_PER_MINUTE", 600))
+
+# Hourly ingest catches up on missed runs from the latest stored hour, at most this far back
+# (older gaps need pipelines/backfill_pipeline.py)
+INGEST_CATCHUP_MAX_HOURS = int(os.getenv("INGEST_CATCHUP_MAX_HOURS", 168))
+
+# Streaming backfill: history is fetched and featurized in chunks of this many days
+BACKFILL_CHUNK_DAYS = int(os.getenv("BACKFILL_CHUNK_DAYS", 30))
+# Local directory for the chunks and the resume manifest of unfinished runs;
+# point it at a persistent path (e.g. a CI cache) to resume across runners
+BACKFILL_WORK_DIR = os.getenv("BACKFILL_WORK_DIR") or os.path.join(tempfile.gettempdir(), "aqi_backfill")
+# Worker processes for the backfill's clean / feature passes (1 = in-process, 0 = one per core)
+BACKFILL_PROCESSES = int(os.getenv("BACKFILL_PROCESSES", 1)) or os.cpu_count()
+# An unfinished run older than this starts over: the hours after its range would be
+# beyond what the hourly ingest catches up
+BACKFILL_RESUME_MAX_HOURS = int(os.getenv("BACKFILL_RESUME_MAX_HOURS", INGEST_CATCHUP_MAX_HOURS))
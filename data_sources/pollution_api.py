@@ -3,20 +3,25 @@ import pandas as pd
 from datetime import datetime, timezone
 from config.config import LAT, LON, OPENWEATHER_API_KEY
 from features.aqi_calculator import compute_overall_aqi
+from data_sources.rate_limit import limiter
+from monitoring.metrics import stage, add_bytes
 
-def fetch_pollution_history(start_dt, end_dt):
+@stage("fetch_pollution")
+def fetch_pollution_history(start_dt, end_dt, lat=LAT, lon=LON):
     url = "http://api.openweathermap.org/data/2.5/air_pollution/history"
 
     params = {
-        "lat": LAT,
-        "lon": LON,
+        "lat": lat,
+        "lon": lon,
         "start": int(start_dt.timestamp()),
         "end": int(end_dt.timestamp()),
         "appid": OPENWEATHER_API_KEY
     }
 
+    limiter("openweather").acquire()
     res = requests.get(url, params=params)
     res.raise_for_status()
+    add_bytes(len(res.content))
 
     rows = []
     for item in res.json()["list"]:
@@ -0,0 +1,42 @@
+"""
+Per-provider request rate limits, shared by every thread in the process.
+
+    limiter("openweather").acquire()
+    res = requests.get(...)
+
+A token bucket per provider: up to `per_minute` requests in any minute,
+in bursts of at most `burst`. When many cities are fetched concurrently
+they queue on the same bucket instead of tripping the provider's 429s.
+"""
+import threading
+import time
+from config.config import OPENWEATHER_CALLS_PER_MINUTE, OPEN_METEO_CALLS_PER_MINUTE
+
+class RateLimiter:
+    def __init__(self, per_minute, burst=None):
+        self.rate = per_minute / 60.0
+        self.capacity = float(burst or max(1, per_minute // 6))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a request may be sent"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+_limiters = {
+    "openweather": RateLimiter(OPENWEATHER_CALLS_PER_MINUTE),
+    "open_meteo": RateLimiter(OPEN_METEO_CALLS_PER_MINUTE)
+}
+
+def limiter(provider):
+    return _limiters[provider]
@@ -1,21 +1,26 @@
 import requests
 import pandas as pd
 from config.config import LAT, LON
+from data_sources.rate_limit import limiter
+from monitoring.metrics import stage, add_bytes
 
-def fetch_weather_history(start_date, end_date):
+@stage("fetch_weather")
+def fetch_weather_history(start_date, end_date, lat=LAT, lon=LON):
     url = "https://archive-api.open-meteo.com/v1/archive"
 
     params = {
-        "latitude": LAT,
-        "longitude": LON,
+        "latitude": lat,
+        "longitude": lon,
         "start_date": start_date,
         "end_date": end_date,
         "hourly": "temperature_2m,relativehumidity_2m,pressure_msl,windspeed_10m",
         "timezone": "UTC"
     }
 
+    limiter("open_meteo").acquire()
     res = requests.get(url, params=params)
     res.raise_for_status()
+    add_bytes(len(res.content))
 
     data = res.json()["hourly"]
     df = pd.DataFrame(data)
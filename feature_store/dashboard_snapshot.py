@@ -0,0 +1,114 @@
+"""
+Per-city dashboard snapshot.
+
+One small document per city holding everything the Streamlit page shows:
+today's average, daily history, the 3-day forecast, the model table and
+live accuracy. Ingestion publishes the observed sections, inference the
+forecast and model sections, the accuracy monitor the accuracy section.
+Every publish bumps `version`, which the app polls to invalidate its
+cache instead of re-querying on a timer.
+"""
+from datetime import datetime, timedelta, timezone
+from feature_store.mongodb_store import collection as features_col, forecasts_col, dashboard_col, load_accuracy
+from config.config import MODEL_NAME, DASHBOARD_HISTORY_DAYS
+
+ACCURACY_VERSIONS = 3
+
+def publish_snapshot(city, **sections):
+    dashboard_col.update_one(
+        {"city": city},
+        {
+            "$set": {**sections, "updated_at": datetime.now(timezone.utc)},
+            "$inc": {"version": 1}
+        },
+        upsert=True
+    )
+    print(f"Published dashboard snapshot for {city}: {', '.join(sections)}")
+
+# ================== SECTIONS ==================
+def observed_sections(city, days=DASHBOARD_HISTORY_DAYS):
+    """Daily mean AQI of the last `days` days plus today's running average, one aggregation"""
+    today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    rows = features_col.aggregate([
+        {"$match": {
+            "city": city,
+            "timestamp": {"$gte": today - timedelta(days=days)},
+            "real_aqi": {"$ne": None}
+        }},
+        {"$group": {
+            "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$timestamp"}},
+            "real_aqi": {"$avg": "$real_aqi"},
+            "hours": {"$sum": 1}
+        }},
+        {"$sort": {"_id": 1}}
+    ])
+
+    today_key = today.date().isoformat()
+    history, today_section = [], {
+        "date": today_key,
+        "avg_aqi": None,
+        "message": "No AQI data available for today yet"
+    }
+    for r in rows:
+        if r["_id"] == today_key:
+            today_section = {
+                "date": today_key,
+                "avg_aqi": round(r["real_aqi"], 2),
+                "hours_recorded": r["hours"]
+            }
+        else:
+            history.append({"date": r["_id"], "real_aqi": round(r["real_aqi"], 2)})
+
+    return {"today": today_section, "history": history}
+
+def forecast_section(city, days=3):
+    """Latest issued forecast for the next `days` days"""
+    tomorrow = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    cursor = (
+        forecasts_col.find(
+            {"city": city, "superseded": False, "date": {"$gte": tomorrow}},
+            {"_id": 0, "date": 1, "avg_aqi": 1, "model_version": 1}
+        )
+        .sort("date", 1)
+        .limit(days)
+    )
+    return [
+        {"date": f["date"].date().isoformat(), "avg_aqi": round(f["avg_aqi"], 2), "model_version": f["model_version"]}
+        for f in cursor
+    ]
+
+def model_section():
+    """Today's registered candidates and their metrics (same table the app builds live)"""
+    from mlflow.tracking import MlflowClient
+    from monitoring.model_metrics import todays_model_metrics
+    return todays_model_metrics(MlflowClient(), MODEL_NAME)
+
+def accuracy_section(city, versions=ACCURACY_VERSIONS):
+    """Live MAE / RMSE per horizon of the newest `versions` model versions with scored days"""
+    df = load_accuracy(city)
+    if df.empty:
+        return []
+    df = df[df["model_version"].isin(sorted(df["model_version"].unique())[-versions:])]
+    return [
+        {
+            "model_version": int(r.model_version),
+            "horizon": int(r.horizon),
+            "scored": int(r.n),
+            "mae": round(r.MAE, 2),
+            "rmse": round(r.RMSE, 2),
+            "bias": round(r.bias, 2)
+        }
+        for r in df.sort_values(["model_version", "horizon"], ascending=[False, True]).itertuples()
+    ]
+
+# ================== PUBLISHERS ==================
+def publish_after_ingest(city):
+    # The forecast is re-read too, so the day that just became today leaves
+    # the forecast cards without waiting for the next inference run
+    publish_snapshot(city, forecast=forecast_section(city), **observed_sections(city))
+
+def publish_after_inference(cities):
+    # The model table is the same for every city
+    models = model_section()
+    for city in cities:
+        publish_snapshot(city, forecast=forecast_section(city), models=models, **observed_sections(city))
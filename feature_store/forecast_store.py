@@ -0,0 +1,108 @@
+"""
+Idempotent daily forecast store.
+
+One document per (city, date, model_version, issued_at hour). Re-running
+inference in the same hour overwrites instead of appending. When a newer
+issue arrives, older forecasts for the same date are flagged superseded
+so "latest forecast per date" is a single bounded index scan, and their
+expires_at is shortened so the TTL index drops them.
+"""
+from datetime import datetime, timedelta, timezone
+import pandas as pd
+from pymongo import ASCENDING, UpdateOne, UpdateMany
+from config.config import FORECAST_RETENTION_DAYS, SUPERSEDED_RETENTION_DAYS
+from monitoring.metrics import stage
+
+def ensure_indexes(col):
+    col.create_index(
+        [("city", ASCENDING), ("date", ASCENDING),
+         ("model_version", ASCENDING), ("issued_at", ASCENDING)],
+        unique=True,
+        name="forecast_key"
+    )
+    # Serves the dashboard's latest-per-date read
+    col.create_index(
+        [("city", ASCENDING), ("superseded", ASCENDING), ("date", ASCENDING)],
+        name="latest_per_date"
+    )
+    col.create_index([("expires_at", ASCENDING)], expireAfterSeconds=0, name="ttl")
+
+def issue_hour(ts=None):
+    ts = ts or datetime.now(timezone.utc)
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+def upsert_forecasts(col, city, daily_avg, model_version, issued_at=None):
+    """
+    Bulk upsert one forecast per row of daily_avg (date, avg_aqi) and
+    supersede everything issued earlier for the same dates.
+    """
+    upsert_forecasts_many(col, daily_avg.assign(city=city), model_version, issued_at)
+
+@stage("write_forecasts")
+def upsert_forecasts_many(col, forecasts, model_version, issued_at=None):
+    """Same as upsert_forecasts for (city, date, avg_aqi) rows of many cities, in one bulk write"""
+    issued_at = issue_hour(issued_at)
+    ops = []
+
+    for r in forecasts.to_dict("records"):
+        date = pd.Timestamp(r["date"]).to_pydatetime()
+        key = {
+            "city": r["city"],
+            "date": date,
+            "model_version": int(model_version),
+            "issued_at": issued_at
+        }
+        ops.append(UpdateOne(
+            key,
+            {"$set": {
+                **key,
+                "avg_aqi": float(r["avg_aqi"]),
+                "superseded": False,
+                "expires_at": date + timedelta(days=FORECAST_RETENTION_DAYS)
+            }},
+            upsert=True
+        ))
+        ops.append(UpdateMany(
+            {
+                "city": r["city"],
+                "date": date,
+                "issued_at": {"$lte": issued_at},
+                "superseded": False,
+                "$nor": [{"model_version": int(model_version), "issued_at": issued_at}]
+            },
+            {"$set": {
+                "superseded": True,
+                "expires_at": date + timedelta(days=SUPERSEDED_RETENTION_DAYS)
+            }}
+        ))
+
+    if ops:
+        res = col.bulk_write(ops, ordered=True)
+        print(f"Forecasts upserted: {res.upserted_count}, updated: {res.modified_count}")
+
+def latest_forecasts(col, city, start_date, days=3):
+    """Latest forecast for each of the next `days` dates from start_date"""
+    cursor = (
+        col.find(
+            {"city": city, "superseded": False, "date": {"$gte": start_date}},
+            {"_id": 0, "date": 1, "avg_aqi": 1, "model_version": 1, "issued_at": 1}
+        )
+        .sort("date", ASCENDING)
+        .limit(days)
+    )
+    return pd.DataFrame(list(cursor))
+
+def latest_forecasts_many(col, cities, start_date, days=3):
+    """Latest forecasts of several cities in one query, with a city column"""
+    cursor = (
+        col.find(
+            {
+                "city": {"$in": list(cities)},
+                "superseded": False,
+                "date": {"$gte": start_date, "$lt": start_date + timedelta(days=days)}
+            },
+            {"_id": 0, "city": 1, "date": 1, "avg_aqi": 1, "model_version": 1, "issued_at": 1}
+        )
+        .sort([("city", ASCENDING), ("date", ASCENDING)])
+    )
+    return pd.DataFrame(list(cursor))
@@ -1,13 +1,47 @@
 from pymongo import MongoClient
 import pandas as pd
 from pymongo import MongoClient, UpdateOne
-from config.config import MONGO_URI, MONGO_DB, MONGO_COLLECTION
+from config.config import (
+    MONGO_URI,
+    MONGO_DB,
+    MONGO_COLLECTION,
+    ONLINE_STATE_COLLECTION,
+    SHAP_COLLECTION,
+    FEATURE_SELECTION_COLLECTION,
+    BACKTEST_COLLECTION,
+    FORECASTS_COLLECTION,
+    ACCURACY_COLLECTION,
+    ACCURACY_DAYS_COLLECTION,
+    DASHBOARD_COLLECTION,
+    ROLLUPS_COLLECTION
+)
+from monitoring.metrics import stage
 
 client = MongoClient(MONGO_URI)
 collection = client[MONGO_DB][MONGO_COLLECTION]
+online_state_col = client[MONGO_DB][ONLINE_STATE_COLLECTION]
+shap_col = client[MONGO_DB][SHAP_COLLECTION]
+selection_col = client[MONGO_DB][FEATURE_SELECTION_COLLECTION]
+backtest_col = client[MONGO_DB][BACKTEST_COLLECTION]
+forecasts_col = client[MONGO_DB][FORECASTS_COLLECTION]
+accuracy_col = client[MONGO_DB][ACCURACY_COLLECTION]
+accuracy_days_col = client[MONGO_DB][ACCURACY_DAYS_COLLECTION]
+dashboard_col = client[MONGO_DB][DASHBOARD_COLLECTION]
+rollups_col = client[MONGO_DB][ROLLUPS_COLLECTION]
 
 collection.create_index([("city", 1), ("timestamp", 1)], unique=True)
-
+online_state_col.create_index([("city", 1)], unique=True)
+shap_col.create_index([("model_name", 1), ("version", 1)], unique=True)
+selection_col.create_index([("created_at", -1)])
+backtest_col.create_index([("model_name", 1), ("version", 1), ("fingerprint", 1)], unique=True)
+accuracy_col.create_index([("city", 1), ("model_version", 1), ("horizon", 1)], unique=True)
+accuracy_days_col.create_index([("city", 1), ("date", 1)], unique=True)
+dashboard_col.create_index([("city", 1)], unique=True)
+# Lets the dashboard poll the snapshot version from the index alone
+dashboard_col.create_index([("city", 1), ("version", 1)])
+rollups_col.create_index([("city", 1), ("resolution", 1), ("bucket", 1)], unique=True)
+
+@stage("mongo_write")
 def upsert_features(df):
     ops = []
     for r in df.to_dict("records"):
@@ -22,6 +56,7 @@ def upsert_features(df):
         res = collection.bulk_write(ops)
         print(f"Inserted: {res.upserted_count}, Updated: {res.modified_count}")
 
+@stage("mongo_read")
 def load_features(city=None):
     """
     If city is provided → used for prediction
@@ -51,6 +86,7 @@ def load_features(city=None):
 
     return df
 
+@stage("mongo_read_recent")
 def load_recent_history(hours=72, city=None):
     """
     Load recent historical rows from MongoDB to compute lag/rolling features.
@@ -58,10 +94,6 @@ def load_recent_history(hours=72, city=None):
     """
     from datetime import datetime, timedelta, timezone
 
-    client = MongoClient(MONGO_URI)
-    db = client[MONGO_DB]
-    collection = db[MONGO_COLLECTION]
-
     cutoff_time = datetime.now(timezone.utc) - timedelta(hours=hours)
 
     query = {"timestamp": {"$gte": cutoff_time}}
@@ -85,4 +117,85 @@ def load_recent_history(hours=72, city=None):
 
     return df
 
+def latest_timestamp(city):
+    """Newest stored hour for a city, or None if it has no rows (index-only lookup)"""
+    doc = collection.find_one(
+        {"city": city}, {"_id": 0, "timestamp": 1}, sort=[("timestamp", -1)]
+    )
+    if doc is None:
+        return None
+    ts = pd.Timestamp(doc["timestamp"])
+    # Mongo hands back naive UTC datetimes
+    return ts.tz_localize("UTC") if ts.tzinfo is None else ts
+
+def load_online_state(city):
+    """Online model state for a city, or None if it was never trained"""
+    return online_state_col.find_one({"city": city}, {"_id": 0})
+
+def save_online_state(state):
+    online_state_col.replace_one({"city": state["city"]}, state, upsert=True)
+
+def load_shap_importances(model_name, version):
+    """Cached SHAP importances for a registered model version, or None"""
+    doc = shap_col.find_one({"model_name": model_name, "version": int(version)})
+    return doc["importances"] if doc else None
+
+def save_shap_importances(model_name, version, importances):
+    from datetime import datetime, timezone
+
+    shap_col.replace_one(
+        {"model_name": model_name, "version": int(version)},
+        {
+            "model_name": model_name,
+            "version": int(version),
+            "importances": importances,
+            "computed_at": datetime.now(timezone.utc)
+        },
+        upsert=True
+    )
+
+def load_selected_features():
+    """Latest SHAP-selected feature subset, or None if none was computed yet"""
+    doc = selection_col.find_one(sort=[("created_at", -1)])
+    return doc["features"] if doc else None
+
+def save_feature_selection(doc):
+    selection_col.insert_one(dict(doc))
+
+def load_backtest(model_name, version, fingerprint):
+    """Cached backtest of a model version on identical data, or None"""
+    return backtest_col.find_one(
+        {"model_name": model_name, "version": int(version), "fingerprint": fingerprint},
+        {"_id": 0}
+    )
+
+def save_backtest(doc):
+    backtest_col.replace_one(
+        {"model_name": doc["model_name"], "version": doc["version"], "fingerprint": doc["fingerprint"]},
+        doc,
+        upsert=True
+    )
+
+def load_accuracy(city=None, model_version=None):
+    """
+    Live forecast accuracy per (model_version, horizon) from the running
+    aggregates, without touching forecasts or features. city=None pools
+    every city.
+    """
+    query = {}
+    if city is not None:
+        query["city"] = city
+    if model_version is not None:
+        query["model_version"] = int(model_version)
+
+    # The per-aggregate list of counted days is only for idempotent updates
+    df = pd.DataFrame(list(accuracy_col.find(query, {"_id": 0, "days": 0, "updated_at": 0})))
+    if df.empty:
+        return df
+
+    df = df.groupby(["model_version", "horizon"], as_index=False)[["n", "sum_err", "sum_abs_err", "sum_sq_err"]].sum()
 
+    df["MAE"] = df["sum_abs_err"] / df["n"]
+    df["RMSE"] = (df["sum_sq_err"] / df["n"]) ** 0.5
+    df["bias"] = df["sum_err"] / df["n"]
+    return df.sort_values(["model_version", "horizon"]).reset_index(drop=True)
@@ -0,0 +1,62 @@
+"""
+Multi-resolution AQI rollups.
+
+Hourly, 6-hourly and daily buckets of real_aqi (mean / min / max / n) per
+city, so a long-range chart reads at most a few hundred documents of the
+coarsest resolution that still fits its point budget instead of every
+hourly feature row. Ingestion and backfill refresh the buckets of the days
+they wrote (backfill after each chunk); rebuild_rollups redoes a whole city.
+"""
+import pandas as pd
+from pymongo import UpdateOne
+from feature_store.mongodb_store import collection as features_col, rollups_col
+from monitoring.metrics import stage
+
+# Resolution name -> bucket width in hours
+RESOLUTIONS = {"1h": 1, "6h": 6, "1d": 24}
+
+def rollup_frame(df, hours):
+    """Bucket a (timestamp, real_aqi) frame into `hours`-wide buckets; empty buckets are dropped"""
+    s = df.set_index("timestamp")["real_aqi"]
+    out = s.resample(f"{hours}h").agg(["mean", "min", "max", "count"])
+    out = out[out["count"] > 0]
+    out.index.name = "bucket"
+    return out.rename(columns={"count": "n"}).reset_index()
+
+@stage("update_rollups")
+def update_rollups(city, start=None, end=None):
+    """
+    Recompute every bucket overlapping [start, end] (whole days, so the
+    coarsest bucket is always complete). No bounds rebuilds the city.
+    """
+    query = {"city": city, "real_aqi": {"$ne": None}}
+    if start is not None or end is not None:
+        query["timestamp"] = {}
+    if start is not None:
+        query["timestamp"]["$gte"] = pd.Timestamp(start).floor("D").to_pydatetime()
+    if end is not None:
+        query["timestamp"]["$lt"] = (pd.Timestamp(end).floor("D") + pd.Timedelta(days=1)).to_pydatetime()
+
+    df = pd.DataFrame(list(features_col.find(query, {"_id": 0, "timestamp": 1, "real_aqi": 1})))
+    if df.empty:
+        return 0
+    df["timestamp"] = pd.to_datetime(df["timestamp"], utc=True)
+    df["real_aqi"] = pd.to_numeric(df["real_aqi"], errors="coerce")
+    df = df.dropna(subset=["real_aqi"])
+
+    ops = []
+    for resolution, hours in RESOLUTIONS.items():
+        for r in rollup_frame(df, hours).to_dict("records"):
+            bucket = r.pop("bucket").to_pydatetime()
+            ops.append(UpdateOne(
+                {"city": city, "resolution": resolution, "bucket": bucket},
+                {"$set": {**r, "n": int(r["n"])}},
+                upsert=True
+            ))
+    if ops:
+        rollups_col.bulk_write(ops, ordered=False)
+    print(f"Refreshed {len(ops)} AQI rollup buckets for {city}")
+    return len(ops)
+
+def rebuild_rollups(city):
+    return update_rollups(city)
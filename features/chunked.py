@@ -0,0 +1,190 @@
+"""
+Chunked preprocessing and feature engineering with overlap halos.
+
+Long histories are processed as fixed time chunks. Every step only looks a
+bounded number of rows around a row, so a chunk padded with that many
+neighbouring rows (its "halo") produces exactly the rows a full-history
+run would:
+
+    clean_data              ffill / bfill, limit 3      CLEAN_HALO rows each side
+    lag / rolling features  up to 72 rows back          lag_halo() rows before
+    future targets          72 rows ahead               TARGET_HALO rows after
+
+cap_outliers caps at percentiles of the whole history; those are computed
+once from the cleaned chunks (OUTLIER_COLS only) and passed to every chunk.
+
+Chunks live on local disk as Arrow files in a ChunkStore, so memory stays
+at a few chunks however long the history is.
+
+The per-chunk passes are independent given their inputs, so map_chunks can
+run them on a process pool (chunk_pool). Workers only receive a chunk
+number and the work directory; they memory-map the uncompressed Arrow
+files they need (halos are sliced before conversion) and write their
+output next to them, so no DataFrame is pickled between processes.
+features/chunked_benchmark.py measures the speedup on a given machine.
+"""
+import multiprocessing
+import os
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from pyarrow import feather
+from features.preprocessing import clean_data, cap_outliers, OUTLIER_COLS
+from features.feature_engineering import (
+    add_time_features,
+    add_cyclical_time_features,
+    add_lag_features,
+    add_rolling_features,
+    add_weather_interactions,
+    add_future_targets,
+    add_real_aqi
+)
+
+CLEAN_HALO = 3
+TARGET_HALO = 72
+
+def lag_halo(lags, windows):
+    """Rows of history a chunk needs for its lags and rolling windows"""
+    # aqi_roll_mean_w is rolled over real_aqi shifted by one row
+    return max([0, *lags, *(w + 1 for w in windows)])
+
+class ChunkStore:
+    """Numbered DataFrame chunks in a directory, one Arrow file each"""
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def _file(self, i):
+        return os.path.join(self.path, f"{i:06d}.arrow")
+
+    def write(self, i, df):
+        tmp = self._file(i) + ".tmp"
+        # Uncompressed, so readers can memory-map the columns instead of decoding them
+        df.reset_index(drop=True).to_feather(tmp, compression="uncompressed")
+        os.replace(tmp, self._file(i))
+
+    def has(self, i):
+        return os.path.exists(self._file(i))
+
+    def _table(self, i, columns=None):
+        return feather.read_table(self._file(i), columns=columns, memory_map=True)
+
+    def read(self, i, columns=None):
+        return self._table(i, columns).to_pandas()
+
+    def columns(self, i):
+        """Column names of chunk i, from the file's schema"""
+        return self._table(i).column_names
+
+    def rows_before(self, i, n):
+        """Last n rows of chunks i-1, i-2, ... (in time order)"""
+        parts, have = [], 0
+        j = i - 1
+        while have < n and j >= 0:
+            t = self._table(j)
+            parts.insert(0, t.slice(max(0, t.num_rows - (n - have))).to_pandas())
+            have += len(parts[0])
+            j -= 1
+        return pd.concat(parts, ignore_index=True) if parts else None
+
+    def rows_after(self, i, n, count):
+        """First n rows of chunks i+1, i+2, ... (in time order)"""
+        parts, have = [], 0
+        j = i + 1
+        while have < n and j < count:
+            parts.append(self._table(j).slice(0, n - have).to_pandas())
+            have += len(parts[-1])
+            j += 1
+        return pd.concat(parts, ignore_index=True) if parts else None
+
+def _padded(before, chunk, after):
+    frames = [f for f in (before, chunk, after) if f is not None and not f.empty]
+    df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else chunk.copy()
+    return df, 0 if before is None else len(before)
+
+def clean_chunk(raw, before=None, after=None):
+    """clean_data + add_real_aqi for the rows of `raw`, given its raw neighbours"""
+    if raw.empty:
+        return raw
+    df, start = _padded(before, raw, after)
+    df = clean_data(df).iloc[start:start + len(raw)].reset_index(drop=True)
+    return add_real_aqi(df)
+
+def collect_outlier_columns(store, count):
+    """Concatenated OUTLIER_COLS of the cleaned chunks in `store`, reading only those columns"""
+    return pd.concat(
+        [store.read(i, [c for c in OUTLIER_COLS if c in store.columns(i)]) for i in range(count)],
+        ignore_index=True
+    )
+
+def featurize_chunk(chunk, before, after, caps, lags, windows):
+    """
+    cap_outliers + every feature step for the rows of a cleaned chunk.
+    before / after are the neighbouring cleaned rows (lag_halo() before,
+    TARGET_HALO after).
+    """
+    if chunk.empty:
+        return chunk
+    df, start = _padded(before, chunk, after)
+
+    df = cap_outliers(df, caps)
+    df = add_time_features(df)
+    df = add_cyclical_time_features(df)
+    df = add_lag_features(df, lags)
+    df = add_rolling_features(df, windows)
+    df = add_weather_interactions(df)
+    df = add_future_targets(df)
+
+    return df.iloc[start:start + len(chunk)].reset_index(drop=True)
+
+# ================== PARALLEL PASSES ==================
+def clean_task(i, work, count):
+    """clean_chunk for chunk i: work/raw -> work/clean"""
+    raw, cleaned = ChunkStore(os.path.join(work, "raw")), ChunkStore(os.path.join(work, "clean"))
+    df = clean_chunk(raw.read(i), raw.rows_before(i, CLEAN_HALO), raw.rows_after(i, CLEAN_HALO, count))
+    cleaned.write(i, df)
+    return len(df)
+
+def featurize_task(i, work, count, caps, lags, windows):
+    """featurize_chunk for chunk i: work/clean -> work/features"""
+    cleaned, features = ChunkStore(os.path.join(work, "clean")), ChunkStore(os.path.join(work, "features"))
+    df = featurize_chunk(
+        cleaned.read(i),
+        cleaned.rows_before(i, lag_halo(lags, windows)),
+        cleaned.rows_after(i, TARGET_HALO, count),
+        caps, lags, windows
+    )
+    features.write(i, df)
+    return len(df)
+
+@contextmanager
+def chunk_pool(processes):
+    """
+    Worker pool shared by the passes of a run (so workers start once), or
+    None to run the passes in-process when processes <= 1.
+    """
+    if processes <= 1:
+        yield None
+        return
+
+    # spawn, not fork: the parent may hold a Mongo client and scheduler threads.
+    # Spawned workers re-import the main module, so pipelines that use this
+    # import the feature store lazily (see backfill_pipeline.run_backfill)
+    pool = ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn"))
+    try:
+        yield pool
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+def map_chunks(task, chunks, pool, *args):
+    """
+    Yield (i, task(i, *args)) for the chunk numbers in `chunks`, in that
+    order, computed on `pool` (a chunk_pool) or in-process when it is None.
+    """
+    chunks = list(chunks)
+    if pool is None:
+        for i in chunks:
+            yield i, task(i, *args)
+        return
+    yield from zip(chunks, pool.map(task, chunks, *([a] * len(chunks) for a in args)))
@@ -0,0 +1,100 @@
+"""
+Scaling benchmark for the backfill's process-parallel passes.
+
+Runs the clean and feature passes of features/chunked.py over a synthetic
+hourly history (no API or Mongo) with each worker count, reports the
+speedup over one process and fails if any output differs from the
+single-process one:
+
+    python -m features.chunked_benchmark --days 730 --processes 1,2,4,8
+
+Run it on the machine that runs the backfill; the speedup is bounded by
+its cores (os.cpu_count() is printed with the results).
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+import numpy as np
+import pandas as pd
+from features.chunked import ChunkStore, chunk_pool, clean_task, featurize_task, map_chunks, collect_outlier_columns
+from features.feature_engineering import LAGS, ROLLING_WINDOWS
+from features.preprocessing import outlier_caps
+
+POLLUTANTS = ["pm2_5", "pm10", "no2", "so2", "o3", "co"]
+WEATHER = ["temperature_2m", "relativehumidity_2m", "pressure_msl", "windspeed_10m"]
+
+def synthetic_history(days, seed=0):
+    """Hourly merged pollution + weather rows with gaps, missing and negative readings"""
+    rng = np.random.default_rng(seed)
+    end = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    ts = pd.date_range(end - timedelta(days=days), end, freq="h", inclusive="left")
+    ts = ts[rng.random(len(ts)) > 0.03]
+
+    df = pd.DataFrame({"timestamp": ts})
+    for col in POLLUTANTS:
+        v = rng.gamma(2, 30, len(ts))
+        v[rng.random(len(ts)) < 0.05] = np.nan
+        v[rng.random(len(ts)) < 0.01] = -1
+        df[col] = v
+    for col in WEATHER:
+        df[col] = rng.normal(20, 5, len(ts))
+    df["city"] = "benchmark"
+    return df
+
+def run_passes(work, count, processes):
+    """Clean + feature passes as run_backfill does them; returns the seconds taken"""
+    started = time.perf_counter()
+    with chunk_pool(processes) as pool:
+        for _ in map_chunks(clean_task, range(count), pool, work, count):
+            pass
+        caps = outlier_caps(collect_outlier_columns(ChunkStore(os.path.join(work, "clean")), count))
+        features = ChunkStore(os.path.join(work, "features"))
+        for i, _ in map_chunks(featurize_task, range(count), pool, work, count, caps, LAGS, ROLLING_WINDOWS):
+            features.read(i)  # what the upsert loop reads
+    return time.perf_counter() - started
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=730)
+    parser.add_argument("--chunk-days", type=int, default=30)
+    parser.add_argument("--processes", default="1,2,4", help="comma separated worker counts")
+    args = parser.parse_args()
+
+    counts = sorted({int(p) for p in args.processes.split(",")} | {1})
+    history = synthetic_history(args.days)
+    day = history["timestamp"].dt.floor("D")
+    chunk = ((day - day.iloc[0]).dt.days // args.chunk_days).to_numpy()
+    n = int(chunk.max()) + 1
+    print(f"{len(history)} rows in {n} chunks of {args.chunk_days} days, {os.cpu_count()} cores")
+
+    results, reference, failed = [], None, False
+    with tempfile.TemporaryDirectory(prefix="chunked_benchmark_") as tmp:
+        for processes in counts:
+            work = os.path.join(tmp, str(processes))
+            raw = ChunkStore(os.path.join(work, "raw"))
+            for i in range(n):
+                raw.write(i, history[chunk == i])
+
+            seconds = run_passes(work, n, processes)
+            features = ChunkStore(os.path.join(work, "features"))
+            out = pd.concat([features.read(i) for i in range(n)], ignore_index=True)
+            if reference is None:
+                reference = out
+            identical = out.equals(reference)
+            failed |= not identical
+            results.append((processes, seconds, identical))
+
+    base = results[0][1]
+    print(f"\n{'processes':>9} {'seconds':>9} {'speedup':>8} {'efficiency':>10}  identical")
+    for processes, seconds, identical in results:
+        print(f"{processes:>9} {seconds:>9.2f} {base / seconds:>7.2f}x {base / seconds / processes:>9.0%}  {identical}")
+
+    if failed:
+        print("\nFAIL: parallel output differs from the single-process run")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,39 @@
+import re
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 from features.aqi_calculator import compute_overall_aqi
+from monitoring.metrics import stage
 
+LAGS = [1, 2, 3, 6, 12, 24, 48, 72]
+ROLLING_WINDOWS = [3, 6, 12, 24, 48]
+
+def feature_plan(features=None):
+    """
+    Lags and rolling windows needed to compute `features`.
+    None -> everything (the default feature set).
+    """
+    if not features:
+        return LAGS, ROLLING_WINDOWS
+
+    lags = set()
+    windows = set()
+    for f in features:
+        m = re.fullmatch(r"(?:pm2_5|aqi)_lag_(\d+)", f)
+        if m:
+            lags.add(int(m.group(1)))
+        m = re.fullmatch(r"(?:pm2_5|aqi)_roll_(?:mean|std)_(\d+)", f)
+        if m:
+            windows.add(int(m.group(1)))
+    return sorted(lags), sorted(windows)
+
+@stage()
 def add_time_features(df):
     df["hour"] = df["timestamp"].dt.hour
     df["day_of_week"] = df["timestamp"].dt.weekday
     df["is_weekend"] = (df["day_of_week"] >= 5).astype(int)
     return df
 
+@stage()
 def add_cyclical_time_features(df):
     """Helps model understand cyclic nature of time"""
     df["hour_sin"] = np.sin(2 * np.pi * df["hour"] / 24)
@@ -16,27 +43,43 @@ def add_cyclical_time_features(df):
     df["dow_cos"] = np.cos(2 * np.pi * df["day_of_week"] / 7)
     return df
 
-def add_lag_features(df):
+@stage()
+def add_lag_features(df, lags=LAGS):
     """Past pollution levels strongly influence future AQI"""
     df = df.sort_values("timestamp")
 
-    for lag in [1, 2, 3, 6, 12, 24, 48, 72]:
+    for lag in lags:
         df[f"pm2_5_lag_{lag}"] = df["pm2_5"].shift(lag)
         df[f"aqi_lag_{lag}"] = df["real_aqi"].shift(lag)
 
     return df
 
-def add_rolling_features(df):
+def _rolling(values, w, fn, **kwargs):
+    """
+    fn over each trailing window of w rows; NaN for the first w - 1 rows and
+    for windows holding a NaN (like Series.rolling(w)). Each value is computed
+    from its own window rather than from running sums, so it doesn't depend on
+    where the series starts: chunked backfills match full-history runs exactly.
+    """
+    out = np.full(len(values), np.nan)
+    if len(values) >= w:
+        out[w - 1:] = fn(sliding_window_view(values, w), axis=1, **kwargs)
+    return out
+
+@stage()
+def add_rolling_features(df, windows=ROLLING_WINDOWS):
     """Rolling statistics capture pollution trends"""
-    windows = [3, 6, 12, 24, 48]
+    pm25 = df["pm2_5"].to_numpy(dtype=float)
+    aqi_prev = df["real_aqi"].shift(1).to_numpy(dtype=float)
 
     for w in windows:
-        df[f"pm2_5_roll_mean_{w}"] = df["pm2_5"].rolling(w).mean()
-        df[f"pm2_5_roll_std_{w}"] = df["pm2_5"].rolling(w).std()
-        df[f"aqi_roll_mean_{w}"] = df["real_aqi"].shift(1).rolling(w).mean()
+        df[f"pm2_5_roll_mean_{w}"] = _rolling(pm25, w, np.mean)
+        df[f"pm2_5_roll_std_{w}"] = _rolling(pm25, w, np.std, ddof=1)
+        df[f"aqi_roll_mean_{w}"] = _rolling(aqi_prev, w, np.mean)
 
     return df
 
+@stage()
 def add_weather_interactions(df):
     """Weather strongly affects pollution dispersion"""
     df["temp_x_pm25"] = df["temperature_2m"] * df["pm2_5"]
@@ -44,18 +87,24 @@ def add_weather_interactions(df):
     df["humidity_x_pm25"] = df["relativehumidity_2m"] * df["pm2_5"]
     return df
 
+@stage()
 def add_future_targets(df):
     """
     Create AQI targets for next 1, 2 and 3 days (24h intervals)
+
+    Shifted within each city so a multi-city frame never labels one city's
+    rows with another city's AQI.
     """
     df = df.sort_values("timestamp")
+    aqi = df.groupby("city")["real_aqi"] if "city" in df.columns else df["real_aqi"]
 
-    df["aqi_t_plus_24"] = df["real_aqi"].shift(-24)
-    df["aqi_t_plus_48"] = df["real_aqi"].shift(-48)
-    df["aqi_t_plus_72"] = df["real_aqi"].shift(-72)
+    df["aqi_t_plus_24"] = aqi.shift(-24)
+    df["aqi_t_plus_48"] = aqi.shift(-48)
+    df["aqi_t_plus_72"] = aqi.shift(-72)
 
     return df
 
+@stage()
 def add_real_aqi(df):
     """
     Compute real AQI (0–500) from pollutant concentrations
@@ -1,3 +1,6 @@
+from monitoring.metrics import stage
+
+@stage()
 def clean_data(df):
     df = df.sort_values("timestamp")
 
@@ -13,11 +16,22 @@ def clean_data(df):
             
     return df
 
-def cap_outliers(df):
-    """Cap extreme pollution spikes to reduce model noise"""
-    cols = ["pm2_5", "pm10", "no2", "o3", "real_aqi"]
-    for col in cols:
+OUTLIER_COLS = ["pm2_5", "pm10", "no2", "o3", "real_aqi"]
+
+def outlier_caps(df):
+    """99th percentile of each capped column"""
+    return {col: df[col].quantile(0.99) for col in OUTLIER_COLS if col in df.columns}
+
+@stage()
+def cap_outliers(df, caps=None):
+    """
+    Cap extreme pollution spikes to reduce model noise.
+    caps defaults to this frame's own percentiles; chunked runs pass the
+    percentiles of the whole history.
+    """
+    if caps is None:
+        caps = outlier_caps(df)
+    for col, upper in caps.items():
         if col in df.columns:
-            upper = df[col].quantile(0.99)
             df[col] = df[col].clip(upper=upper)
     return df
\ No newline at end of file
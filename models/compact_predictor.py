@@ -0,0 +1,256 @@
+"""
+Compact NumPy-only predictor for promoted models.
+
+The sklearn Pipeline (SimpleImputer + MultiOutputRegressor of boosters or
+Ridge) is compiled into flat arrays saved as a single .npz file. Loading
+and scoring it needs only NumPy, no sklearn / xgboost / lightgbm.
+
+Tree nodes are stored in global arrays; every tree is an offset into them.
+Leaves point to themselves so a fixed number of vectorized steps walks
+all rows through all trees at once.
+"""
+import json
+import numpy as np
+
+# How a node routes missing values
+MISSING_DEFAULT = 0   # NaN follows the node's default direction
+MISSING_AS_ZERO = 1   # NaN is compared as 0.0 (LightGBM missing_type=None)
+ZERO_DEFAULT = 2      # NaN and 0.0 follow the default direction (missing_type=Zero)
+
+# ================== COMPILE ==================
+def _xgb_trees(est):
+    """Flat node dicts of an XGBRegressor from its exact JSON model"""
+    learner = json.loads(est.get_booster().save_raw("json"))["learner"]
+    base_score = float(learner["learner_model_param"]["base_score"].strip("[]"))
+
+    trees = []
+    for t in learner["gradient_booster"]["model"]["trees"]:
+        left = t["left_children"]
+        # JSON holds shortest decimals of float32 values; restore the exact
+        # float32 so inputs equal to a bin cut point go the same way
+        conditions = np.asarray(t["split_conditions"], dtype=np.float32).astype(np.float64).tolist()
+        trees.append({
+            "feature": t["split_indices"],
+            "threshold": conditions,
+            "left": left,
+            "right": t["right_children"],
+            "default_left": t["default_left"],
+            "missing": [MISSING_DEFAULT] * len(left),
+            "inclusive": [False] * len(left),  # x < threshold
+            "value": conditions,               # leaves keep their value here
+            "is_leaf": [c == -1 for c in left]
+        })
+    return trees, base_score, np.float32
+
+def _lgb_trees(est):
+    """Flat node dicts of an LGBMRegressor from dump_model()"""
+    dump = est.booster_.dump_model()
+    missing_modes = {"NaN": MISSING_DEFAULT, "None": MISSING_AS_ZERO, "Zero": ZERO_DEFAULT}
+
+    trees = []
+    for info in dump["tree_info"]:
+        nodes = {k: [] for k in [
+            "feature", "threshold", "left", "right", "default_left",
+            "missing", "inclusive", "value", "is_leaf"
+        ]}
+
+        def add(node):
+            i = len(nodes["feature"])
+            for k in nodes:
+                nodes[k].append(0)
+            if "leaf_value" in node or "split_feature" not in node:
+                nodes["value"][i] = node.get("leaf_value", 0.0)
+                nodes["is_leaf"][i] = True
+                nodes["left"][i] = nodes["right"][i] = -1
+                return i
+            if node["decision_type"] != "<=":
+                raise ValueError("Categorical splits are not supported")
+            nodes["feature"][i] = node["split_feature"]
+            nodes["threshold"][i] = node["threshold"]
+            nodes["default_left"][i] = node["default_left"]
+            nodes["missing"][i] = missing_modes[node["missing_type"]]
+            nodes["inclusive"][i] = True
+            nodes["is_leaf"][i] = False
+            nodes["left"][i] = add(node["left_child"])
+            nodes["right"][i] = add(node["right_child"])
+            return i
+
+        add(info["tree_structure"])
+        trees.append(nodes)
+    return trees, 0.0, np.float64
+
+def _flatten(per_output):
+    """Concatenate the trees of every output into global node arrays"""
+    cols = {k: [] for k in [
+        "feature", "threshold", "left", "right", "default_left",
+        "missing", "inclusive", "value", "is_leaf"
+    ]}
+    roots, tree_output, depth = [], [], 0
+
+    for out, trees in enumerate(per_output):
+        for t in trees:
+            offset = len(cols["feature"])
+            n = len(t["feature"])
+            roots.append(offset)
+            tree_output.append(out)
+
+            for k in cols:
+                cols[k].extend(t[k])
+
+            # Global child ids; leaves loop on themselves
+            for j in range(n):
+                g = offset + j
+                if t["is_leaf"][j]:
+                    cols["left"][g] = cols["right"][g] = g
+                else:
+                    cols["left"][g] = offset + t["left"][j]
+                    cols["right"][g] = offset + t["right"][j]
+
+            depth = max(depth, _depth(t))
+
+    return {
+        "feature": np.asarray(cols["feature"], dtype=np.int32),
+        "threshold": np.asarray(cols["threshold"], dtype=np.float64),
+        "left": np.asarray(cols["left"], dtype=np.int32),
+        "right": np.asarray(cols["right"], dtype=np.int32),
+        "default_left": np.asarray(cols["default_left"], dtype=bool),
+        "missing": np.asarray(cols["missing"], dtype=np.int8),
+        "inclusive": np.asarray(cols["inclusive"], dtype=bool),
+        "value": np.asarray(cols["value"], dtype=np.float64),
+        "is_leaf": np.asarray(cols["is_leaf"], dtype=bool),
+        "roots": np.asarray(roots, dtype=np.int32),
+        "tree_output": np.asarray(tree_output, dtype=np.int32),
+        "max_depth": np.int32(depth)
+    }
+
+def _depth(t):
+    stack, depth = [(0, 0)], 0
+    while stack:
+        i, d = stack.pop()
+        depth = max(depth, d)
+        if not t["is_leaf"][i]:
+            stack.append((t["left"][i], d + 1))
+            stack.append((t["right"][i], d + 1))
+    return depth
+
+def compile_model(model, feature_names):
+    """
+    Compile a trained candidate into a dict of NumPy arrays.
+    Supports Pipeline(imputer, MultiOutputRegressor) and a bare
+    MultiOutputRegressor of XGBoost / LightGBM / linear estimators.
+    """
+    if hasattr(model, "named_steps"):
+        imputer = model.named_steps.get("imputer")
+        regressor = model.named_steps["regressor"]
+    else:
+        imputer, regressor = None, model
+
+    n_features = len(feature_names)
+    if imputer is not None:
+        impute_means = np.asarray(imputer.statistics_, dtype=np.float64)
+        # SimpleImputer drops all-NaN training columns before the regressor
+        input_columns = np.flatnonzero(~np.isnan(impute_means))
+    else:
+        impute_means = np.full(n_features, np.nan)
+        input_columns = np.arange(n_features)
+
+    compact = {
+        "feature_names": np.asarray(feature_names),
+        "impute_means": impute_means,
+        "input_columns": input_columns.astype(np.int32)
+    }
+
+    estimators = regressor.estimators_
+    first = estimators[0]
+
+    if hasattr(first, "coef_"):
+        compact["kind"] = np.asarray("linear")
+        compact["coef"] = np.vstack([np.ravel(e.coef_) for e in estimators])
+        compact["intercept"] = np.asarray([float(e.intercept_) for e in estimators])
+        return compact
+
+    if hasattr(first, "get_booster"):
+        compile_fn = _xgb_trees
+    elif hasattr(first, "booster_"):
+        compile_fn = _lgb_trees
+    else:
+        raise ValueError(f"Cannot compile {type(first).__name__}")
+
+    per_output, base_scores = [], []
+    for est in estimators:
+        trees, base_score, dtype = compile_fn(est)
+        per_output.append(trees)
+        base_scores.append(base_score)
+
+    compact.update(_flatten(per_output))
+    compact["kind"] = np.asarray("trees")
+    compact["base_score"] = np.asarray(base_scores, dtype=np.float64)
+    # XGBoost compares features in float32
+    compact["float32_inputs"] = np.bool_(dtype == np.float32)
+    return compact
+
+# ================== PREDICT ==================
+class CompactPredictor:
+    """Drop-in replacement for the sklearn model's predict()"""
+
+    def __init__(self, arrays):
+        self.arrays = arrays
+        self.feature_names = [str(f) for f in arrays["feature_names"]]
+        self.kind = str(arrays["kind"])
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls({k: data[k] for k in data.files})
+
+    def save(self, path):
+        np.savez_compressed(path, **self.arrays)
+
+    def _impute(self, X):
+        X = np.array(X, dtype=np.float64)
+        means = self.arrays["impute_means"]
+        fill = np.isnan(X) & ~np.isnan(means)
+        X[fill] = np.broadcast_to(means, X.shape)[fill]
+        return X[:, self.arrays["input_columns"]]
+
+    def predict(self, X):
+        X = self._impute(X)
+
+        if self.kind == "linear":
+            return X @ self.arrays["coef"].T + self.arrays["intercept"]
+
+        a = self.arrays
+        if bool(a["float32_inputs"]):
+            X = X.astype(np.float32).astype(np.float64)
+
+        n_rows = X.shape[0]
+        rows = np.arange(n_rows)[:, None]
+        idx = np.broadcast_to(a["roots"], (n_rows, len(a["roots"]))).copy()
+
+        for _ in range(int(a["max_depth"])):
+            x = X[rows, a["feature"][idx]]
+            thr = a["threshold"][idx]
+            mode = a["missing"][idx]
+            nan = np.isnan(x)
+
+            x = np.where(nan & (mode == MISSING_AS_ZERO), 0.0, x)
+            go_left = np.where(a["inclusive"][idx], x <= thr, x < thr)
+
+            use_default = (nan & (mode != MISSING_AS_ZERO)) | ((mode == ZERO_DEFAULT) & (x == 0))
+            go_left = np.where(use_default, a["default_left"][idx], go_left)
+
+            idx = np.where(go_left, a["left"][idx], a["right"][idx])
+
+        leaf_values = a["value"][idx]
+        n_outputs = len(a["base_score"])
+        preds = np.empty((n_rows, n_outputs))
+        for out in range(n_outputs):
+            preds[:, out] = a["base_score"][out] + leaf_values[:, a["tree_output"] == out].sum(axis=1)
+        return preds
+
+def check_parity(model, predictor, X, atol=1e-3, rtol=1e-4):
+    """Max abs difference between the original model and the compact predictor"""
+    expected = np.asarray(model.predict(X))
+    actual = predictor.predict(np.asarray(X, dtype=np.float64))
+    diff = float(np.max(np.abs(expected - actual)))
+    return np.allclose(expected, actual, atol=atol, rtol=rtol), diff
@@ -0,0 +1,92 @@
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from sklearn.base import clone
+from sklearn.metrics import mean_squared_error
+
+def split_model(model):
+    """Return (imputer or None, MultiOutputRegressor) for any trained candidate"""
+    if hasattr(model, "named_steps"):
+        return model.named_steps.get("imputer"), model.named_steps["regressor"]
+    return None, model
+
+def _contributions(est, X, background_mean):
+    """
+    Per-row, per-feature SHAP values of one fitted estimator.
+    Boosters use their built-in TreeSHAP, linear models the exact
+    linear SHAP coef * (x - E[x]).
+    """
+    if hasattr(est, "get_booster"):
+        import xgboost as xgb
+        contribs = est.get_booster().predict(xgb.DMatrix(X), pred_contribs=True)
+        return contribs[:, :-1]
+    if hasattr(est, "booster_"):
+        return est.predict(X, pred_contrib=True)[:, :-1]
+    if hasattr(est, "coef_"):
+        return (X - background_mean) * np.ravel(est.coef_)
+    raise ValueError(f"No SHAP support for {type(est).__name__}")
+
+def compute_shap_importances(model, X, batch_size=1000, workers=4):
+    """
+    Mean |SHAP| per feature, averaged over all output horizons.
+    Rows are split into batches scored in parallel (the boosters release the GIL).
+    """
+    imputer, regressor = split_model(model)
+    feature_names = list(X.columns)
+
+    X_arr = imputer.transform(X) if imputer is not None else X.to_numpy(dtype=float)
+    background_mean = np.nanmean(X_arr, axis=0)
+    batches = [X_arr[i:i + batch_size] for i in range(0, len(X_arr), batch_size)]
+
+    def score_batch(batch):
+        return sum(
+            np.abs(_contributions(est, batch, background_mean)).sum(axis=0)
+            for est in regressor.estimators_
+        )
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        totals = sum(pool.map(score_batch, batches))
+
+    importances = totals / (len(X_arr) * len(regressor.estimators_))
+    return dict(zip(feature_names, importances.astype(float).tolist()))
+
+def _holdout_rmse(model, X_train, y_train, X_test, y_test, features):
+    m = clone(model)
+    m.fit(X_train[features], y_train)
+    preds = m.predict(X_test[features])
+    return float(np.sqrt(mean_squared_error(y_test, preds)))
+
+def select_min_features(model, importances, X_train, y_train, X_test, y_test, tolerance=0.02):
+    """
+    Smallest top-k feature subset (ranked by SHAP importance) whose holdout
+    RMSE stays within `tolerance` of the RMSE with every column of X.
+    Binary search over k, so only O(log n_features) refits.
+
+    The budget is anchored to all available features rather than the
+    current model's subset, so repeated runs can't compound the tolerance.
+    If the ranked subset itself misses the budget, all features are kept.
+    """
+    all_features = list(X_train.columns)
+    ranked = sorted(importances, key=importances.get, reverse=True)
+    ranked = [f for f in ranked if f in all_features]
+
+    full_rmse = _holdout_rmse(model, X_train, y_train, X_test, y_test, all_features)
+    budget = full_rmse * (1 + tolerance)
+
+    ranked_rmse = _holdout_rmse(model, X_train, y_train, X_test, y_test, ranked)
+    if ranked_rmse > budget:
+        print("   Ranked subset misses the RMSE budget, keeping all features")
+        return all_features, full_rmse, full_rmse
+
+    lo, hi = 1, len(ranked)
+    best_rmse = ranked_rmse
+    while lo < hi:
+        mid = (lo + hi) // 2
+        rmse = _holdout_rmse(model, X_train, y_train, X_test, y_test, ranked[:mid])
+        print(f"   top {mid:>3} features -> RMSE {rmse:.4f} (budget {budget:.4f})")
+        if rmse <= budget:
+            hi = mid
+            best_rmse = rmse
+        else:
+            lo = mid + 1
+
+    return ranked[:lo], full_rmse, best_rmse
@@ -0,0 +1,164 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import mlflow
+from mlflow.exceptions import MlflowException
+from mlflow.tracking import MlflowClient
+from models.compact_predictor import CompactPredictor
+from config.config import (
+    MODEL_CACHE_DIR,
+    MODEL_CACHE_KEEP,
+    PRODUCTION_ALIAS,
+    COMPACT_PREDICTOR_PATH
+)
+
+MANIFEST = "manifest.json"
+
+def get_production_version(model_name):
+    """
+    Production version via a single alias lookup. Falls back to scanning
+    versions for models promoted before the alias was set.
+    """
+    client = MlflowClient()
+    try:
+        return client.get_model_version_by_alias(model_name, PRODUCTION_ALIAS)
+    except MlflowException:
+        pass
+
+    for mv in client.search_model_versions(f"name='{model_name}'"):
+        if mv.current_stage == "Production":
+            return mv
+    raise ValueError("No Production model found!")
+
+def _sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _checksums(root):
+    sums = {}
+    for dirpath, _, files in os.walk(root):
+        for name in files:
+            if name == MANIFEST:
+                continue
+            path = os.path.join(dirpath, name)
+            sums[os.path.relpath(path, root)] = _sha256(path)
+    return sums
+
+def _read_manifest(cache_dir):
+    """Manifest of a complete, uncorrupted cache entry, else None"""
+    path = os.path.join(cache_dir, MANIFEST)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        manifest = json.load(f)
+    if _checksums(cache_dir) != manifest["files"]:
+        print(f"Checksum mismatch in {cache_dir}, discarding cached model")
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        return None
+    return manifest
+
+def _download(model_name, mv, compact, dst):
+    """Download one version into dst and return (relative path, feature names)"""
+    if compact:
+        local_path = mlflow.artifacts.download_artifacts(
+            run_id=mv.run_id, artifact_path=COMPACT_PREDICTOR_PATH, dst_path=dst
+        )
+        return os.path.relpath(local_path, dst), CompactPredictor.load(local_path).feature_names
+
+    local_path = mlflow.artifacts.download_artifacts(
+        f"models:/{model_name}/{mv.version}", dst_path=dst
+    )
+    signature = mlflow.models.Model.load(os.path.join(local_path, "MLmodel")).signature
+    if signature is None:
+        raise ValueError("Model signature missing!")
+    return os.path.relpath(local_path, dst), [col.name for col in signature.inputs]
+
+def _prune(model_name, keep_version):
+    """Keep only the MODEL_CACHE_KEEP most recent versions on disk"""
+    root = os.path.join(MODEL_CACHE_DIR, model_name)
+    versions = sorted((int(v) for v in os.listdir(root) if v.isdigit()), reverse=True)
+    for v in versions[MODEL_CACHE_KEEP:]:
+        if v != int(keep_version):
+            shutil.rmtree(os.path.join(root, str(v)), ignore_errors=True)
+
+def fetch_model_version(model_name, mv, compact):
+    """
+    Local copy of a model version, downloaded at most once.
+    Returns the cache manifest (kind, path, feature names, checksums).
+    """
+    kind = "compact" if compact else "sklearn"
+    cache_dir = os.path.join(MODEL_CACHE_DIR, model_name, str(mv.version), kind)
+
+    manifest = _read_manifest(cache_dir)
+    if manifest is not None:
+        print(f"Using cached {kind} model version {mv.version}")
+        return cache_dir, manifest
+
+    os.makedirs(os.path.dirname(cache_dir), exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=os.path.dirname(cache_dir))
+    try:
+        rel_path, feature_names = _download(model_name, mv, compact, tmp)
+        manifest = {
+            "model_name": model_name,
+            "version": int(mv.version),
+            "run_id": mv.run_id,
+            "kind": kind,
+            "path": rel_path,
+            "feature_names": feature_names,
+            "files": _checksums(tmp)
+        }
+        with open(os.path.join(tmp, MANIFEST), "w") as f:
+            json.dump(manifest, f)
+
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        os.replace(tmp, cache_dir)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    _prune(model_name, mv.version)
+    print(f"Cached {kind} model version {mv.version}")
+    return cache_dir, manifest
+
+def _lacks_compact_predictor(mv, error):
+    """
+    True only if the version's run really has no compact predictor, so a
+    network or disk error while fetching it is never remembered as one.
+    """
+    if isinstance(error, MlflowException) and error.error_code == "RESOURCE_DOES_NOT_EXIST":
+        return True
+    try:
+        artifacts = MlflowClient().list_artifacts(mv.run_id, os.path.dirname(COMPACT_PREDICTOR_PATH))
+    except (MlflowException, OSError):
+        return False
+    return COMPACT_PREDICTOR_PATH not in {a.path for a in artifacts}
+
+def load_model_version(model_name, mv, compact=True):
+    """
+    Load a model version from the local cache, downloading it on a miss.
+    compact=True prefers the NumPy predictor and falls back to the full
+    sklearn model when the version has none.
+    Returns (model, feature_names).
+    """
+    # Remembers versions exported without a compact predictor
+    no_compact = os.path.join(MODEL_CACHE_DIR, model_name, str(mv.version), "no_compact")
+
+    if compact and not os.path.exists(no_compact):
+        try:
+            cache_dir, manifest = fetch_model_version(model_name, mv, compact=True)
+            predictor = CompactPredictor.load(os.path.join(cache_dir, manifest["path"]))
+            return predictor, manifest["feature_names"]
+        except (MlflowException, OSError) as e:
+            print(f"Compact predictor unavailable ({e}), loading full model")
+            # Other failures may be transient: the next load tries the compact predictor again
+            if _lacks_compact_predictor(mv, e):
+                os.makedirs(os.path.dirname(no_compact), exist_ok=True)
+                open(no_compact, "w").close()
+
+    cache_dir, manifest = fetch_model_version(model_name, mv, compact=False)
+    model = mlflow.sklearn.load_model(os.path.join(cache_dir, manifest["path"]))
+    return model, manifest["feature_names"]
@@ -0,0 +1,127 @@
+import math
+import numpy as np
+import pandas as pd
+
+HORIZONS = [24, 48, 72]
+
+NON_FEATURE_COLS = [
+    "timestamp",
+    "city",
+    "us_aqi",
+    "aqi_t_plus_24",
+    "aqi_t_plus_48",
+    "aqi_t_plus_72"
+]
+
+def init_state(city, feature_names):
+    """Empty online model: running feature stats + one linear model per horizon"""
+    d = len(feature_names)
+    return {
+        "city": city,
+        "feature_names": list(feature_names),
+        "n_seen": 0,
+        "mean": [0.0] * d,
+        "m2": [0.0] * d,
+        # last weight is the bias term
+        "weights": {str(h): [0.0] * (d + 1) for h in HORIZONS},
+        "n_updates": {str(h): 0 for h in HORIZONS},
+        "last_timestamp": None
+    }
+
+def select_features(df):
+    """Numeric model inputs of a feature-store frame"""
+    cols = [c for c in df.columns if c not in NON_FEATURE_COLS]
+    return df[cols].select_dtypes(include="number").columns.tolist()
+
+def _standardize(state, x):
+    """Scale x with the running stats; missing values map to the mean (0)"""
+    mean = np.asarray(state["mean"])
+    n = state["n_seen"]
+    std = np.sqrt(np.asarray(state["m2"]) / n) if n > 1 else np.ones_like(mean)
+    std[std == 0] = 1.0
+    z = (x - mean) / std
+    z[np.isnan(z)] = 0.0
+    return np.append(z, 1.0)
+
+def observe(state, x):
+    """Welford update of the per-feature running mean/variance"""
+    mean = np.asarray(state["mean"])
+    m2 = np.asarray(state["m2"])
+    n = state["n_seen"] + 1
+
+    valid = ~np.isnan(x)
+    delta = np.where(valid, x - mean, 0.0)
+    mean = mean + delta / n
+    m2 = m2 + delta * np.where(valid, x - mean, 0.0)
+
+    state["n_seen"] = n
+    state["mean"] = mean.tolist()
+    state["m2"] = m2.tolist()
+    return state
+
+def update(state, x, horizon, y, learning_rate=0.05):
+    """
+    One normalized-LMS step for `horizon` on (x, y).
+    Cost is O(features), independent of how much history was seen.
+    """
+    if y is None or (isinstance(y, float) and math.isnan(y)):
+        return state
+
+    z = _standardize(state, x)
+    w = np.asarray(state["weights"][str(horizon)])
+
+    err = y - float(z @ w)
+    w = w + learning_rate * err * z / (1.0 + float(z @ z))
+
+    state["weights"][str(horizon)] = w.tolist()
+    state["n_updates"][str(horizon)] += 1
+    return state
+
+def row_vector(state, row):
+    """Align a feature-store row (dict or Series) to the state's feature order"""
+    row = pd.Series(row).reindex(state["feature_names"])
+    return pd.to_numeric(row, errors="coerce").to_numpy(dtype=float)
+
+def predict(state, X):
+    """
+    Predict all horizons for a feature frame.
+    Returns an (n_rows, 3) array ordered like HORIZONS.
+    """
+    X = X.reindex(columns=state["feature_names"]).apply(pd.to_numeric, errors="coerce")
+    Z = np.vstack([_standardize(state, x) for x in X.to_numpy(dtype=float)])
+    W = np.column_stack([state["weights"][str(h)] for h in HORIZONS])
+    return np.clip(Z @ W, 0, None)
+
+def learn_from_new_rows(state, df, learning_rate=0.05):
+    """
+    Feed every row newer than state["last_timestamp"] to the model.
+
+    A row at time t provides:
+      - new feature statistics from its own inputs
+      - the matured target real_aqi(t) for the rows at t-24h, t-48h and t-72h
+    """
+    df = df.drop_duplicates(subset=["timestamp"], keep="last").sort_values("timestamp")
+    by_ts = df.set_index("timestamp")
+
+    last = state["last_timestamp"]
+    if last is not None:
+        last = pd.Timestamp(last)
+        if last.tzinfo is None:
+            last = last.tz_localize("UTC")
+        new_rows = df[df["timestamp"] > last]
+    else:
+        new_rows = df
+
+    for _, row in new_rows.iterrows():
+        ts = row["timestamp"]
+        state = observe(state, row_vector(state, row))
+
+        for h in HORIZONS:
+            origin = ts - pd.Timedelta(hours=h)
+            if origin in by_ts.index:
+                x = row_vector(state, by_ts.loc[origin])
+                state = update(state, x, h, row["real_aqi"], learning_rate)
+
+        state["last_timestamp"] = ts.to_pydatetime()
+
+    return state
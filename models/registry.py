@@ -0,0 +1,49 @@
+"""
+Trainer registry.
+
+Trainers are registered as "module:function" strings and only imported
+when selected, so listing candidates or training one model does not pull
+in every ML library. A trainer is called as fn(prepare_data, log_model)
+and returns (version, avg_rmse), like models/train_*.train_model.
+
+Extra trainers can be registered with register_trainer() or through
+TRAINER_PLUGINS="name=package.module:function,...".
+"""
+from importlib import import_module
+from config.config import TRAINER_PLUGINS
+
+# Built-in candidates, in training order
+TRAINERS = {
+    "random_forest": "models.train_random_forest:train_model",
+    "lightgbm": "models.train_lightgbm:train_model",
+    "xgboost": "models.train_xgboost:train_model",
+    "ridge": "models.train_linear:train_model"
+}
+
+def register_trainer(name, target):
+    """Register (or replace) a trainer given as "package.module:function" """
+    if ":" not in target:
+        raise ValueError(f"Trainer target must be 'module:function', got {target!r}")
+    TRAINERS[name] = target
+
+for _plugin in filter(None, (p.strip() for p in TRAINER_PLUGINS.split(","))):
+    _name, _, _target = _plugin.partition("=")
+    register_trainer(_name.strip(), _target.strip())
+
+def available_trainers():
+    return list(TRAINERS)
+
+def load_trainer(name):
+    """Import the trainer's module and return its entry point"""
+    if name not in TRAINERS:
+        raise ValueError(f"Unknown model {name!r}; available: {', '.join(TRAINERS)}")
+    module, _, function = TRAINERS[name].partition(":")
+    return getattr(import_module(module), function)
+
+def select_trainers(names=None):
+    """[(name, entry point)] for the requested names, or for every registered trainer"""
+    names = names or available_trainers()
+    unknown = [n for n in names if n not in TRAINERS]
+    if unknown:
+        raise ValueError(f"Unknown model(s) {', '.join(unknown)}; available: {', '.join(TRAINERS)}")
+    return [(name, load_trainer(name)) for name in names]
@@ -3,6 +3,8 @@ from sklearn.multioutput import MultiOutputRegressor
 from sklearn.impute import SimpleImputer
 from sklearn.pipeline import Pipeline
 from feature_store.mongodb_store import load_features
+from models.warm_start import warm_start_fit
+from monitoring.metrics import timed
 
 def train_model(prepare_data, log_model):
     print("Training LightGBM model...")
@@ -19,13 +21,26 @@ def train_model(prepare_data, log_model):
 
     base_model = lgb.LGBMRegressor(**params)
 
-    model = Pipeline([
-        ("imputer", SimpleImputer(strategy="mean")),
-        ("regressor", MultiOutputRegressor(base_model))
-    ])
+    warm = warm_start_fit(
+        "LightGBM_AQI_Forecast", base_model, X_train, y_train,
+        init_param="init_model",
+        count_trees=lambda est: (est.booster_, est.booster_.num_trees())
+    )
 
-    model.fit(X_train, y_train)
-    preds = model.predict(X_test)
+    if warm is not None:
+        model, info = warm
+        params = {**params, **info}
+    else:
+        params = {**params, "train_mode": "full"}
+        model = Pipeline([
+            ("imputer", SimpleImputer(strategy="mean")),
+            ("regressor", MultiOutputRegressor(base_model))
+        ])
+
+        with timed("lightgbm.fit", rows=len(X_train)):
+            model.fit(X_train, y_train)
+    with timed("lightgbm.predict", rows=len(X_test)):
+        preds = model.predict(X_test)
 
     version, rmse = log_model(model, "LightGBM_AQI_Forecast", params, X_train, y_test, preds)
     return version, rmse
@@ -4,6 +4,7 @@ from sklearn.multioutput import MultiOutputRegressor
 from sklearn.impute import SimpleImputer
 from sklearn.pipeline import Pipeline
 from feature_store.mongodb_store import load_features
+from monitoring.metrics import timed
 
 def train_model(prepare_data, log_model):
     print("Training Ridge model...")
@@ -20,8 +21,10 @@ def train_model(prepare_data, log_model):
         ("regressor", MultiOutputRegressor(base_model))
     ])
 
-    model.fit(X_train, y_train)
-    preds = model.predict(X_test)
+    with timed("ridge.fit", rows=len(X_train)):
+        model.fit(X_train, y_train)
+    with timed("ridge.predict", rows=len(X_test)):
+        preds = model.predict(X_test)
 
     version, rmse = log_model(model, "Ridge_AQI_Forecast", params, X_train, y_test, preds)
     return version, rmse
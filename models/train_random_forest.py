@@ -1,6 +1,7 @@
 from xgboost import XGBRegressor
 from sklearn.multioutput import MultiOutputRegressor
 from feature_store.mongodb_store import load_features
+from monitoring.metrics import timed
 
 def train_model(prepare_data, log_model):
     print("Training Random Forest model...")
@@ -18,9 +19,11 @@ def train_model(prepare_data, log_model):
     }
 
     model = MultiOutputRegressor(XGBRegressor(**params))
-    model.fit(X_train, y_train)
+    with timed("random_forest.fit", rows=len(X_train)):
+        model.fit(X_train, y_train)
 
-    preds = model.predict(X_test)
+    with timed("random_forest.predict", rows=len(X_test)):
+        preds = model.predict(X_test)
    
     version, rmse = log_model(model, "RandomForest_AQI_Forecast", params, X_train, y_test, preds)
     return version, rmse
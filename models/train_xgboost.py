@@ -3,6 +3,8 @@ from sklearn.multioutput import MultiOutputRegressor
 from sklearn.impute import SimpleImputer
 from sklearn.pipeline import Pipeline
 from feature_store.mongodb_store import load_features
+from models.warm_start import warm_start_fit
+from monitoring.metrics import timed
 
 def train_model(prepare_data, log_model):
     print("Training XGBoost model...")
@@ -22,13 +24,26 @@ def train_model(prepare_data, log_model):
 
     base_model = XGBRegressor(**params)
 
-    model = Pipeline([
-        ("imputer", SimpleImputer(strategy="mean")),
-        ("regressor", MultiOutputRegressor(base_model))
-    ])
+    warm = warm_start_fit(
+        "XGBoost_AQI_Forecast", base_model, X_train, y_train,
+        init_param="xgb_model",
+        count_trees=lambda est: (est.get_booster(), est.get_booster().num_boosted_rounds())
+    )
 
-    model.fit(X_train, y_train)
-    preds = model.predict(X_test)
+    if warm is not None:
+        model, info = warm
+        params = {**params, **info}
+    else:
+        params = {**params, "train_mode": "full"}
+        model = Pipeline([
+            ("imputer", SimpleImputer(strategy="mean")),
+            ("regressor", MultiOutputRegressor(base_model))
+        ])
+
+        with timed("xgboost.fit", rows=len(X_train)):
+            model.fit(X_train, y_train)
+    with timed("xgboost.predict", rows=len(X_test)):
+        preds = model.predict(X_test)
 
     version, rmse = log_model(model, "XGBoost_AQI_Forecast", params, X_train, y_test, preds)
     return version, rmse
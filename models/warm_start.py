@@ -0,0 +1,119 @@
+import copy
+from datetime import datetime, timezone
+import pandas as pd
+import mlflow
+import mlflow.sklearn
+from mlflow.tracking import MlflowClient
+from sklearn.base import clone
+from config.config import (
+    MODEL_NAME,
+    TRAIN_MODE,
+    WARM_START_HOURS,
+    WARM_START_ROUNDS,
+    MAX_WARM_START_TREES,
+    FULL_REFIT_EVERY_DAYS
+)
+from monitoring.metrics import stage
+
+def is_full_refit_day():
+    """Periodic safeguard: refit from scratch every FULL_REFIT_EVERY_DAYS days"""
+    if FULL_REFIT_EVERY_DAYS <= 1:
+        return True
+    # Days since a fixed date, so the cadence doesn't restart every January
+    day = datetime.now(timezone.utc).date().toordinal()
+    return day % FULL_REFIT_EVERY_DAYS == 0
+
+def find_warm_start_version(run_name):
+    """
+    Registered version to continue from: the Production version if it was
+    produced by this trainer, otherwise the trainer's most recent version.
+    """
+    client = MlflowClient()
+    runs = mlflow.search_runs(
+        filter_string=f"tags.mlflow.runName = '{run_name}'",
+        search_all_experiments=True,
+        output_format="list"
+    )
+    run_ids = {r.info.run_id for r in runs}
+
+    candidates = [
+        mv for mv in client.search_model_versions(f"name='{MODEL_NAME}'")
+        if mv.run_id in run_ids
+    ]
+    if not candidates:
+        return None
+
+    for mv in candidates:
+        if mv.current_stage == "Production":
+            return mv
+    return max(candidates, key=lambda mv: int(mv.version))
+
+@stage()
+def warm_start_fit(run_name, base_model, X_train, y_train, init_param, count_trees):
+    """
+    Continue boosting the previous version of `run_name` on the newest
+    WARM_START_HOURS of the training rows.
+
+    prepare_data holds the newest TRAIN_HOLDOUT_HOURS out of X_train, so
+    the updated model is scored on the same rows as a full refit. The window
+    is a time span: every city contributes its rows for those hours.
+
+    init_param  -> fit() keyword taking the previous booster
+                   ("init_model" for LightGBM, "xgb_model" for XGBoost)
+    count_trees -> returns (booster, number of trees) for a fitted estimator
+
+    Returns (model, info) with info the params to log (train mode, real tree
+    count, ...), or None when a full refit is required.
+    """
+    if TRAIN_MODE != "incremental":
+        return None
+
+    if is_full_refit_day():
+        print("Scheduled full refit day, skipping warm start")
+        return None
+
+    mv = find_warm_start_version(run_name)
+    if mv is None:
+        print(f"No previous {run_name} version, falling back to full refit")
+        return None
+
+    prev_model = mlflow.sklearn.load_model(f"models:/{MODEL_NAME}/{mv.version}")
+
+    # Feature set changed since the previous version -> trees no longer line up
+    if list(getattr(prev_model, "feature_names_in_", [])) != list(X_train.columns):
+        print("Feature set changed, falling back to full refit")
+        return None
+
+    prev_estimators = prev_model.named_steps["regressor"].estimators_
+    boosters = [count_trees(est) for est in prev_estimators]
+    if max(n for _, n in boosters) + WARM_START_ROUNDS > MAX_WARM_START_TREES:
+        print(f"Tree budget of {MAX_WARM_START_TREES} reached, falling back to full refit")
+        return None
+
+    # prepare_data indexes the rows by timestamp
+    window = X_train.index > X_train.index.max() - pd.Timedelta(hours=WARM_START_HOURS)
+
+    print(
+        f"Warm-starting {run_name} from version {mv.version} on the newest "
+        f"{WARM_START_HOURS} labelled hours"
+    )
+
+    # Keep the previous imputer so the old trees see the same inputs
+    model = copy.deepcopy(prev_model)
+    X_recent = model.named_steps["imputer"].transform(X_train[window])
+    y_recent = y_train[window]
+
+    estimators = []
+    for i, (booster, _) in enumerate(boosters):
+        est = clone(base_model).set_params(n_estimators=WARM_START_ROUNDS)
+        est.fit(X_recent, y_recent.iloc[:, i], **{init_param: booster})
+        estimators.append(est)
+
+    model.named_steps["regressor"].estimators_ = estimators
+    info = {
+        "train_mode": "incremental",
+        "n_estimators": max(n for _, n in boosters) + WARM_START_ROUNDS,
+        "warm_start_from_version": int(mv.version),
+        "warm_start_rows": len(y_recent)
+    }
+    return model, info
@@ -0,0 +1,257 @@
+"""
+Lightweight per-stage instrumentation.
+
+    @stage("clean_data")
+    def clean_data(df): ...
+
+    with timed("lightgbm.fit", rows=len(X_train)):
+        model.fit(X_train, y_train)
+
+    @run_report("backfill")
+    def run_backfill(): ...
+
+Each stage records wall time, rows, bytes and the process peak RSS.
+run_report writes a JSON run report and a Prometheus text-format file
+(for node_exporter's textfile collector) to METRICS_DIR when the entry
+point finishes. With PIPELINE_METRICS off a decorated call costs one
+flag check.
+
+PIPELINE_PROFILE (or `python -m monitoring.profiling`) additionally runs
+the entry point under monitoring.profiling, scoped by the same stages.
+"""
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from functools import wraps
+import pandas as pd
+from config.config import PIPELINE_METRICS, METRICS_DIR, PIPELINE_PROFILE
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_state = {"enabled": PIPELINE_METRICS, "records": [], "profile": PIPELINE_PROFILE, "hooks": [], "active": False}
+# Running stages per thread id, readable from other threads (profiler sampling)
+_stacks = {}
+
+def enabled():
+    return _state["enabled"]
+
+def set_enabled(value):
+    _state["enabled"] = bool(value)
+
+def set_profile(modes):
+    """Profile the next run_report entry point; modes is "cpu", "mem" or "cpu,mem" """
+    _state["profile"] = modes
+
+def peak_rss_bytes():
+    """Process high-water mark RSS, or None where unavailable"""
+    if resource is None:
+        return None
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def _stack():
+    return _stacks.setdefault(threading.get_ident(), [])
+
+def stage_path(thread_id):
+    """Names of the stages running in a thread, outermost first"""
+    return [r["stage"] for r in list(_stacks.get(thread_id, ()))]
+
+def add_bytes(n):
+    """Attribute n transferred bytes to the innermost running stage"""
+    stack = _stack()
+    if _state["enabled"] and stack:
+        stack[-1]["bytes"] += int(n)
+
+def add_rows(n):
+    stack = _stack()
+    if _state["enabled"] and stack:
+        stack[-1]["rows"] += int(n)
+
+class timed:
+    """Context manager recording one stage; a no-op when metrics are off"""
+
+    def __init__(self, name, rows=None):
+        self.name = name
+        self.rows = rows
+        self.record = None
+
+    def __enter__(self):
+        if not _state["enabled"]:
+            return self
+        stack = _stack()
+        self.record = {
+            "stage": self.name,
+            "parent": stack[-1]["stage"] if stack else None,
+            "rows": int(self.rows or 0),
+            "bytes": 0,
+            "peak_rss_before": peak_rss_bytes(),
+            "started": time.perf_counter()
+        }
+        stack.append(self.record)
+        for hook in _state["hooks"]:
+            hook.enter(self.name)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.record is None:
+            return False
+        for hook in reversed(_state["hooks"]):
+            hook.exit(self.name)
+        r = self.record
+        _stack().pop()
+        r["seconds"] = time.perf_counter() - r.pop("started")
+        r["peak_rss"] = peak_rss_bytes()
+        before = r.pop("peak_rss_before")
+        r["peak_rss_growth"] = r["peak_rss"] - before if before is not None else None
+        r["status"] = "failed" if exc_type else "ok"
+        _state["records"].append(r)
+        return False
+
+def _rows_of(result, args):
+    """Rows processed: the DataFrame returned, else the first DataFrame argument"""
+    if isinstance(result, pd.DataFrame):
+        return len(result)
+    for a in args:
+        if isinstance(a, pd.DataFrame):
+            return len(a)
+    return 0
+
+def stage(name=None):
+    """Decorator recording every call of fn as a stage"""
+    def decorate(fn):
+        stage_name = name or fn.__name__
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _state["enabled"]:
+                return fn(*args, **kwargs)
+            with timed(stage_name) as t:
+                result = fn(*args, **kwargs)
+                if t.record["rows"] == 0:
+                    t.record["rows"] = _rows_of(result, args)
+            return result
+        return wrapper
+    return decorate
+
+# ================== REPORTS ==================
+def summarize(records):
+    """Per-stage totals, in first-seen order"""
+    stages = {}
+    for r in records:
+        s = stages.setdefault(r["stage"], {
+            "stage": r["stage"], "parent": r["parent"], "calls": 0,
+            "seconds": 0.0, "rows": 0, "bytes": 0, "peak_rss": None, "failed": 0
+        })
+        s["calls"] += 1
+        s["seconds"] += r["seconds"]
+        s["rows"] += r["rows"]
+        s["bytes"] += r["bytes"]
+        if r["peak_rss"] is not None:
+            s["peak_rss"] = max(s["peak_rss"] or 0, r["peak_rss"])
+        s["failed"] += r["status"] == "failed"
+    return list(stages.values())
+
+def _prometheus(pipeline, report):
+    label = lambda stage: f'pipeline="{pipeline}",stage="{stage}"'
+    lines = []
+
+    def metric(name, help_text, samples):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} gauge")
+        lines.extend(f"{name}{{{labels}}} {value}" for labels, value in samples)
+
+    stages = report["stages"]
+    metric("aqi_pipeline_stage_seconds", "Wall time spent in the stage during the last run",
+           [(label(s["stage"]), f"{s['seconds']:.6f}") for s in stages])
+    metric("aqi_pipeline_stage_calls", "Stage invocations during the last run",
+           [(label(s["stage"]), s["calls"]) for s in stages])
+    metric("aqi_pipeline_stage_rows", "Rows processed by the stage during the last run",
+           [(label(s["stage"]), s["rows"]) for s in stages])
+    metric("aqi_pipeline_stage_bytes", "Bytes transferred by the stage during the last run",
+           [(label(s["stage"]), s["bytes"]) for s in stages])
+    metric("aqi_pipeline_stage_peak_rss_bytes", "Process peak RSS when the stage finished",
+           [(label(s["stage"]), s["peak_rss"]) for s in stages if s["peak_rss"] is not None])
+
+    run = f'pipeline="{pipeline}"'
+    metric("aqi_pipeline_run_seconds", "Wall time of the last run", [(run, f"{report['seconds']:.6f}")])
+    metric("aqi_pipeline_run_success", "1 if the last run succeeded", [(run, int(report["status"] == "ok"))])
+    metric("aqi_pipeline_last_run_timestamp_seconds", "Unix time the last run finished",
+           [(run, int(report["finished_at_unix"]))])
+    if report["peak_rss"] is not None:
+        metric("aqi_pipeline_peak_rss_bytes", "Process peak RSS of the last run", [(run, report["peak_rss"])])
+    return "\n".join(lines) + "\n"
+
+def _write_atomic(path, text):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+def write_report(pipeline, seconds, status):
+    """Write <pipeline>_<utc time>.json and <pipeline>.prom to METRICS_DIR"""
+    finished = datetime.now(timezone.utc)
+    report = {
+        "pipeline": pipeline,
+        "status": status,
+        "finished_at": finished.isoformat(),
+        "finished_at_unix": finished.timestamp(),
+        "seconds": seconds,
+        "peak_rss": peak_rss_bytes(),
+        "stages": summarize(_state["records"]),
+        "calls": _state["records"]
+    }
+
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    json_path = os.path.join(METRICS_DIR, f"{pipeline}_{finished:%Y%m%dT%H%M%SZ}.json")
+    _write_atomic(json_path, json.dumps(report, indent=2, default=str))
+    _write_atomic(os.path.join(METRICS_DIR, f"{pipeline}.prom"), _prometheus(pipeline, report))
+
+    print(f"Metrics report written to {json_path}")
+    for s in report["stages"]:
+        print(f"  {s['stage']:<32} {s['seconds']:9.3f}s  rows={s['rows']:<8} calls={s['calls']}")
+    return report
+
+def run_report(pipeline):
+    """Decorator for pipeline entry points: collect stages and write the reports"""
+    def decorate(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _state["active"]:
+                # Entry point called from another one (e.g. the scheduler,
+                # from any of its threads): a stage of the outer report
+                with timed(pipeline):
+                    return fn(*args, **kwargs)
+            if not _state["enabled"] and not _state["profile"]:
+                return fn(*args, **kwargs)
+
+            profiler = None
+            if _state["profile"]:
+                from monitoring.profiling import Profiler
+                profiler = Profiler(pipeline, _state["profile"])
+                # Profiles are scoped by stages, so stage tracking is needed
+                _state["enabled"] = True
+                _state["hooks"].append(profiler)
+                profiler.start()
+
+            _state["records"] = []
+            _state["active"] = True
+            started = time.perf_counter()
+            status = "failed"
+            try:
+                with timed(pipeline):
+                    result = fn(*args, **kwargs)
+                status = "ok"
+                return result
+            finally:
+                _state["active"] = False
+                if profiler is not None:
+                    _state["hooks"].remove(profiler)
+                    profiler.stop()
+                write_report(pipeline, time.perf_counter() - started, status)
+        return wrapper
+    return decorate
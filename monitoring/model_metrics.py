@@ -0,0 +1,52 @@
+"""
+Today's model table: the registered candidates trained today and their
+metrics. Used by the dashboard snapshot publisher
+(feature_store/dashboard_snapshot.py) and by the app's live fallback.
+It only needs mlflow (no config, no Mongo), since the app imports it
+with the repo root appended to its path.
+"""
+from datetime import datetime, timezone
+
+def todays_model_metrics(client, model_name):
+    """Production and other candidates of today, in two queries however many versions exist"""
+    import mlflow
+
+    today_start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+
+    # One filtered query for the runs started today, with their metrics and tags
+    runs = mlflow.search_runs(
+        search_all_experiments=True,
+        filter_string=f"attributes.start_time >= {int(today_start.timestamp() * 1000)}",
+        output_format="list"
+    )
+    runs_by_id = {run.info.run_id: run for run in runs}
+
+    production, others = None, []
+    if not runs_by_id:
+        return {"production": production, "others": others}
+
+    for v in client.search_model_versions(f"name='{model_name}'"):
+        run = runs_by_id.get(v.run_id)
+        if run is None:
+            continue
+
+        metrics = run.data.metrics
+        info = {
+            "version": int(v.version),
+            "run_name": run.data.tags.get("mlflow.runName"),
+            "stage": v.current_stage,
+            "mae_24h": metrics.get("MAE_24h"),
+            "mae_48h": metrics.get("MAE_48h"),
+            "mae_72h": metrics.get("MAE_72h"),
+            "rmse_24h": metrics.get("RMSE_24h"),
+            "rmse_48h": metrics.get("RMSE_48h"),
+            "rmse_72h": metrics.get("RMSE_72h"),
+            "rmse_avg": metrics.get("RMSE_avg")
+        }
+
+        if v.current_stage == "Production":
+            production = info
+        else:
+            others.append(info)
+
+    return {"production": production, "others": others}
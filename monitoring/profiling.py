@@ -0,0 +1,217 @@
+"""
+On-demand CPU / memory profiling of pipeline entry points, scoped by the
+stages of monitoring.metrics.
+
+Enable with PIPELINE_PROFILE=cpu|mem|cpu,mem, or without touching the
+environment:
+
+    python -m monitoring.profiling --mode cpu,mem pipelines.backfill_pipeline
+
+Writes to PROFILE_DIR:
+    <pipeline>_<time>_cpu.txt        hotspots per stage (cProfile, exclusive of nested stages)
+    <pipeline>_<time>_cpu.prof       whole-run pstats, for snakeviz / pstats
+    <pipeline>_<time>_cpu.collapsed  sampled stacks prefixed by stage, for flamegraph.pl / speedscope
+    <pipeline>_<time>_mem.txt        peak traced memory and top allocation sites per stage
+"""
+import argparse
+import cProfile
+import io
+import os
+import pstats
+import runpy
+import sys
+import threading
+import tracemalloc
+from collections import Counter
+from datetime import datetime, timezone
+from monitoring import metrics
+from config.config import (
+    PROFILE_DIR,
+    PROFILE_SAMPLE_MS,
+    PROFILE_TOP_N,
+    PROFILE_TRACE_FRAMES
+)
+
+class Profiler:
+    """Stage hook driving cProfile, a stack sampler and tracemalloc"""
+
+    def __init__(self, pipeline, modes):
+        modes = {m.strip() for m in modes.split(",") if m.strip()}
+        unknown = modes - {"cpu", "mem"}
+        if unknown:
+            raise ValueError(f"Unknown profile mode(s): {', '.join(sorted(unknown))}")
+
+        self.pipeline = pipeline
+        self.cpu = "cpu" in modes
+        self.mem = "mem" in modes
+        # Per-stage scoping only follows the thread that runs the entry point
+        self.thread_id = threading.get_ident()
+
+        self.cpu_stack = []       # (stage, cProfile.Profile)
+        self.cpu_profiles = {}    # stage -> [Profile]
+        self.samples = Counter()
+        self.mem_stack = []       # [stage, snapshot, peak of finished children]
+        self.mem_stats = {}       # stage -> {"calls", "peak", "growth", "sites"}
+        self._stop = threading.Event()
+        self._sampler = None
+
+    # ================== LIFECYCLE ==================
+    def start(self):
+        if self.cpu:
+            self._sampler = threading.Thread(target=self._sample, name="profile-sampler", daemon=True)
+            self._sampler.start()
+        if self.mem:
+            tracemalloc.start(PROFILE_TRACE_FRAMES)
+
+    def stop(self):
+        if self._sampler is not None:
+            self._stop.set()
+            self._sampler.join()
+        if self.mem:
+            tracemalloc.stop()
+        self.write()
+
+    # ================== STAGE HOOKS ==================
+    def enter(self, stage):
+        if threading.get_ident() != self.thread_id:
+            return
+        # One active cProfile at a time: pause the parent stage's, and keep
+        # snapshot work out of every profile
+        if self.cpu and self.cpu_stack:
+            self.cpu_stack[-1][1].disable()
+        if self.mem:
+            _, peak = tracemalloc.get_traced_memory()
+            if self.mem_stack:
+                self.mem_stack[-1][2] = max(self.mem_stack[-1][2], peak)
+            self.mem_stack.append([stage, tracemalloc.take_snapshot(), 0])
+            tracemalloc.reset_peak()
+        if self.cpu:
+            prof = cProfile.Profile()
+            self.cpu_stack.append((stage, prof))
+            prof.enable()
+
+    def exit(self, stage):
+        if threading.get_ident() != self.thread_id:
+            return
+        if self.cpu and self.cpu_stack:
+            name, prof = self.cpu_stack.pop()
+            prof.disable()
+            self.cpu_profiles.setdefault(name, []).append(prof)
+        if self.mem and self.mem_stack:
+            name, before, children_peak = self.mem_stack.pop()
+            _, peak = tracemalloc.get_traced_memory()
+            peak = max(peak, children_peak)
+            diff = [
+                d for d in tracemalloc.take_snapshot().compare_to(before, "lineno")
+                if not self._ignored(d.traceback[0].filename)
+            ]
+
+            s = self.mem_stats.setdefault(name, {"calls": 0, "peak": 0, "growth": 0, "sites": Counter()})
+            s["calls"] += 1
+            s["peak"] = max(s["peak"], peak)
+            s["growth"] += sum(d.size_diff for d in diff)
+            for d in diff:
+                if d.size_diff > 0:
+                    frame = d.traceback[0]
+                    s["sites"][f"{frame.filename}:{frame.lineno}"] += d.size_diff
+
+            # The parent's peak includes this stage's
+            if self.mem_stack:
+                self.mem_stack[-1][2] = max(self.mem_stack[-1][2], peak)
+        if self.cpu and self.cpu_stack:
+            self.cpu_stack[-1][1].enable()
+
+    @staticmethod
+    def _ignored(filename):
+        """Allocations made by the profiler itself or the import system"""
+        return (
+            filename in (__file__, tracemalloc.__file__, metrics.__file__, "<unknown>")
+            or filename.startswith("<frozen importlib")
+        )
+
+    # ================== SAMPLING ==================
+    def _sample(self):
+        own = threading.get_ident()
+        interval = PROFILE_SAMPLE_MS / 1000
+        while not self._stop.wait(interval):
+            for tid, frame in sys._current_frames().items():
+                if tid == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                # Skip idle pool / helper threads
+                if stack[0].startswith("threading.py:"):
+                    continue
+                path = metrics.stage_path(tid) or ["[no stage]"]
+                self.samples[";".join(path + stack[::-1])] += 1
+
+    # ================== REPORTS ==================
+    def write(self):
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        prefix = os.path.join(
+            PROFILE_DIR, f"{self.pipeline}_{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}"
+        )
+
+        if self.cpu:
+            self._write_cpu(prefix)
+        if self.mem:
+            self._write_mem(prefix)
+
+    def _write_cpu(self, prefix):
+        out = io.StringIO()
+        merged = None
+        ranked = []
+        for name, profiles in self.cpu_profiles.items():
+            try:
+                stats = pstats.Stats(*profiles, stream=out)
+            except TypeError:  # stage made no profiled calls
+                continue
+            ranked.append((stats.total_tt, name, stats))
+            if merged is None:
+                merged = pstats.Stats(*profiles)
+            else:
+                merged.add(*profiles)
+
+        out.write(f"CPU hotspots for {self.pipeline}, per stage (time in nested stages excluded)\n")
+        for total, name, stats in sorted(ranked, key=lambda r: r[0], reverse=True):
+            out.write(f"\n{'=' * 20} {name}: {total:.3f}s {'=' * 20}\n")
+            stats.sort_stats("tottime").print_stats(PROFILE_TOP_N)
+
+        with open(f"{prefix}_cpu.txt", "w") as f:
+            f.write(out.getvalue())
+        if merged is not None:
+            merged.dump_stats(f"{prefix}_cpu.prof")
+        with open(f"{prefix}_cpu.collapsed", "w") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+        print(f"CPU profile written to {prefix}_cpu.*")
+
+    def _write_mem(self, prefix):
+        lines = [f"Memory profile for {self.pipeline} (tracemalloc, per stage)"]
+        ranked = sorted(self.mem_stats.items(), key=lambda kv: kv[1]["peak"], reverse=True)
+        for name, s in ranked:
+            lines.append("")
+            lines.append(
+                f"{'=' * 20} {name}: peak {s['peak'] / 1e6:.1f} MB, "
+                f"net {s['growth'] / 1e6:+.1f} MB over {s['calls']} call(s) {'=' * 20}"
+            )
+            for site, size in s["sites"].most_common(PROFILE_TOP_N):
+                lines.append(f"  {size / 1e6:10.2f} MB  {site}")
+
+        with open(f"{prefix}_mem.txt", "w") as f:
+            f.write("\n".join(lines) + "\n")
+        print(f"Memory profile written to {prefix}_mem.txt")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a pipeline entry point under the profiler")
+    parser.add_argument("--mode", default="cpu", help="cpu, mem or cpu,mem")
+    parser.add_argument("module", help="e.g. pipelines.backfill_pipeline")
+    parser.add_argument("args", nargs=argparse.REMAINDER, help="arguments for the pipeline")
+    args = parser.parse_args()
+
+    metrics.set_profile(args.mode)
+    sys.argv = [args.module] + args.args
+    runpy.run_module(args.module, run_name="__main__", alter_sys=True)
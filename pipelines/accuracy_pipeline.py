@@ -0,0 +1,157 @@
+"""
+Incremental forecast-vs-actual accuracy monitor.
+
+Runs after hourly ingestion. Each newly completed day is scored exactly
+once: its actual mean AQI is compared with every forecast issued for it,
+and the errors are added to running sums per (city, model_version,
+horizon). Reading live MAE / RMSE is then a single small indexed query
+(see feature_store.mongodb_store.load_accuracy); the dashboard snapshot
+and model promotion both read it.
+
+A day with fewer than ACCURACY_MIN_HOURS hours stays pending while it is
+inside the last ACCURACY_LOOKBACK_DAYS, so hours filled in later by the
+ingest catch-up or a backfill still get it scored.
+"""
+from datetime import datetime, timedelta, timezone
+import pandas as pd
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from feature_store.mongodb_store import (
+    collection as features_col,
+    forecasts_col,
+    accuracy_col,
+    accuracy_days_col
+)
+from feature_store.dashboard_snapshot import publish_snapshot, accuracy_section
+from monitoring.metrics import run_report
+from config.config import CITY, ACCURACY_MIN_HOURS, ACCURACY_LOOKBACK_DAYS
+
+def next_day_to_score(city, today):
+    """Day after the last scored one, or the start of the lookback window"""
+    last = accuracy_days_col.find_one({"city": city}, sort=[("date", -1)])
+    if last is None:
+        return today - timedelta(days=ACCURACY_LOOKBACK_DAYS)
+    return last["date"].replace(tzinfo=timezone.utc) + timedelta(days=1)
+
+def recorded_days(city, start):
+    return {
+        d["date"].replace(tzinfo=timezone.utc)
+        for d in accuracy_days_col.find({"city": city, "date": {"$gte": start}}, {"_id": 0, "date": 1})
+    }
+
+def daily_actuals(city, start, end):
+    """Mean real_aqi and hour count per UTC day in [start, end), one aggregation"""
+    rows = features_col.aggregate([
+        {"$match": {
+            "city": city,
+            "timestamp": {"$gte": start, "$lt": end},
+            "real_aqi": {"$ne": None}
+        }},
+        {"$group": {
+            "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$timestamp"}},
+            "actual": {"$avg": "$real_aqi"},
+            "hours": {"$sum": 1}
+        }}
+    ])
+    return {
+        datetime.strptime(r["_id"], "%Y-%m-%d").replace(tzinfo=timezone.utc): r
+        for r in rows
+    }
+
+def score_day(city, day, actual, forecasts):
+    """Aggregate increments for one completed day"""
+    errors = []
+    sums = {}
+    for f in forecasts:
+        issued = f["issued_at"].replace(tzinfo=timezone.utc)
+        days_ahead = max(1, (day - issued.replace(hour=0)).days)
+        err = f["avg_aqi"] - actual
+        errors.append({"model_version": f["model_version"], "horizon": days_ahead * 24, "err": err})
+
+        s = sums.setdefault((f["model_version"], days_ahead * 24), {"n": 0, "sum_err": 0.0, "sum_abs_err": 0.0, "sum_sq_err": 0.0})
+        s["n"] += 1
+        s["sum_err"] += err
+        s["sum_abs_err"] += abs(err)
+        s["sum_sq_err"] += err ** 2
+
+    # One update per aggregate, applied only if the aggregate hasn't counted
+    # this day yet: re-running a day after a crash can't add it twice
+    ops = [
+        UpdateOne(
+            {"city": city, "model_version": version, "horizon": horizon, "days": {"$ne": day}},
+            {
+                "$inc": inc,
+                "$addToSet": {"days": day},
+                "$set": {"updated_at": datetime.now(timezone.utc)}
+            },
+            upsert=True
+        )
+        for (version, horizon), inc in sums.items()
+    ]
+    return ops, errors
+
+def apply_increments(ops):
+    try:
+        accuracy_col.bulk_write(ops, ordered=False)
+    except BulkWriteError as e:
+        # An aggregate that already counted the day doesn't match the filter,
+        # so its upsert collides with the unique index - nothing to add
+        if e.details.get("writeConcernErrors") or any(err["code"] != 11000 for err in e.details["writeErrors"]):
+            raise
+
+@run_report("accuracy")
+def run_accuracy_update(city=CITY):
+    print("Updating forecast accuracy...")
+
+    today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    # Short days are kept pending until they leave the lookback window
+    cutoff = today - timedelta(days=ACCURACY_LOOKBACK_DAYS)
+    start = min(next_day_to_score(city, today), cutoff)
+    done = recorded_days(city, start)
+    if all(start + timedelta(days=i) in done for i in range((today - start).days)):
+        print("No newly completed day to score")
+        return
+
+    actuals = daily_actuals(city, start, today)
+    forecasts = pd.DataFrame(list(forecasts_col.find(
+        {"city": city, "date": {"$gte": start, "$lt": today}},
+        {"_id": 0, "date": 1, "avg_aqi": 1, "model_version": 1, "issued_at": 1}
+    )))
+
+    scored = 0
+    for day in (start + timedelta(days=i) for i in range((today - start).days)):
+        if day in done:
+            continue
+        row = actuals.get(day)
+        hours = row["hours"] if row else 0
+        doc = {"city": city, "date": day, "scored_at": datetime.now(timezone.utc)}
+
+        if hours < ACCURACY_MIN_HOURS:
+            if day >= cutoff:
+                print(f"{day.date()}: {hours} of {ACCURACY_MIN_HOURS} hours so far, scoring it later")
+                continue
+            # Out of the lookback window: recorded unscored so the watermark moves on
+            doc.update(actual=None, hours=hours, forecasts=0)
+        else:
+            day_forecasts = []
+            if not forecasts.empty:
+                match = pd.to_datetime(forecasts["date"], utc=True) == day
+                day_forecasts = forecasts[match].to_dict("records")
+            ops, errors = score_day(city, day, row["actual"], day_forecasts)
+            if ops:
+                apply_increments(ops)
+            doc.update(actual=row["actual"], hours=hours, forecasts=len(errors), errors=errors)
+            scored += 1
+
+        # Recorded only once its errors are in the aggregates
+        accuracy_days_col.update_one({"city": city, "date": day}, {"$setOnInsert": doc}, upsert=True)
+        print(f"Scored {day.date()}: actual={doc['actual']}, forecasts={doc['forecasts']}")
+
+    if scored:
+        try:
+            publish_snapshot(city, accuracy=accuracy_section(city))
+        except Exception as e:
+            print(f"Dashboard accuracy not refreshed: {e}")
+
+if __name__ == "__main__":
+    run_accuracy_update()
@@ -1,49 +1,219 @@
+import argparse
+import json
+import os
+import shutil
 from datetime import datetime, timedelta, timezone
 import pandas as pd
 from data_sources.pollution_api import fetch_pollution_history
 from data_sources.weather_api import fetch_weather_history
-from features.preprocessing import clean_data, cap_outliers
-from features.feature_engineering import (
-    add_time_features,
-    add_cyclical_time_features,
-    add_lag_features,
-    add_rolling_features,
-    add_weather_interactions,
-    add_future_targets,
-    add_real_aqi   
+from features.feature_engineering import feature_plan
+from features.preprocessing import outlier_caps
+from features.chunked import (
+    ChunkStore,
+    chunk_pool,
+    clean_task,
+    featurize_task,
+    map_chunks,
+    collect_outlier_columns
 )
+from config.cities import get_city
+from config.config import (
+    CITY,
+    BACKFILL_DAYS,
+    BACKFILL_CHUNK_DAYS,
+    BACKFILL_WORK_DIR,
+    BACKFILL_PROCESSES,
+    BACKFILL_RESUME_MAX_HOURS,
+    PRUNE_UPSTREAM_FEATURES
+)
+from monitoring.metrics import stage, run_report
 
-from feature_store.mongodb_store import upsert_features
-from config.config import CITY, BACKFILL_DAYS
+def backfill_windows(start_dt, end_dt, chunk_days=BACKFILL_CHUNK_DAYS):
+    """[start, end) windows covering [start_dt, end_dt], split at UTC midnights every chunk_days"""
+    end = end_dt + timedelta(seconds=1)
+    boundary = start_dt.replace(hour=0, minute=0, second=0, microsecond=0)
+    windows = []
+    start = start_dt
+    while start < end:
+        boundary += timedelta(days=chunk_days)
+        stop = min(boundary, end)
+        windows.append((start, stop))
+        start = stop
+    return windows
 
-def run_backfill():
-    end_dt = datetime.now(timezone.utc)
-    start_dt = end_dt - timedelta(days=BACKFILL_DAYS)
+@stage()
+def fetch_window(location, start, stop):
+    """Merged pollution + weather rows with start <= timestamp < stop"""
+    last = stop - timedelta(seconds=1)
+    pollution_df = fetch_pollution_history(start, last, location["lat"], location["lon"])
+    if pollution_df.empty:
+        return pd.DataFrame()
+    weather_df = fetch_weather_history(start.date(), last.date(), location["lat"], location["lon"])
 
-    print(f"Backfilling data from {start_dt.date()} to {end_dt.date()}")
+    df = pd.merge(pollution_df, weather_df, on="timestamp", how="inner")
+    df = df[(df["timestamp"] >= start) & (df["timestamp"] < stop)]
+    df["city"] = location["name"]
+    return df.sort_values("timestamp").reset_index(drop=True)
 
-    pollution_df = fetch_pollution_history(start_dt, end_dt)
-    weather_df = fetch_weather_history(start_dt.date(), end_dt.date())
+class BackfillManifest:
+    """
+    Progress of one backfill run, as a small JSON file in its work directory.
 
-    df = pd.merge(pollution_df, weather_df, on="timestamp", how="inner")
-    df["city"] = CITY
+    A run is the list of chunk windows between `start` and `end`; each chunk
+    goes through the steps STEPS in order. A step is recorded once its
+    output is on disk (or in Mongo), so a rerun resumes after the last
+    recorded unit.
+    """
+    STEPS = ("fetched", "cleaned", "featurized", "upserted")
+
+    def __init__(self, path, state):
+        self.path = path
+        self.state = state
+
+    @classmethod
+    def load(cls, path):
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return cls(path, json.load(f))
+
+    @classmethod
+    def create(cls, path, city, days, chunk_days, lags, rolling_windows, start_dt, end_dt):
+        manifest = cls(path, {
+            "city": city,
+            "days": days,
+            "chunk_days": chunk_days,
+            "lags": list(lags),
+            "rolling_windows": list(rolling_windows),
+            "start": start_dt.isoformat(),
+            "end": end_dt.isoformat(),
+            **{step: [] for step in cls.STEPS}
+        })
+        manifest.save()
+        return manifest
+
+    def matches(self, days, chunk_days, lags, rolling_windows):
+        """Same run settings and feature plan, so finished chunks can be reused as they are"""
+        return (
+            self.state["days"] == days
+            and self.state["chunk_days"] == chunk_days
+            and self.state.get("lags") == list(lags)
+            and self.state.get("rolling_windows") == list(rolling_windows)
+        )
+
+    def age_hours(self):
+        """Hours since the end of the run's range"""
+        return (datetime.now(timezone.utc) - self.window[1]).total_seconds() / 3600
+
+    @property
+    def window(self):
+        return datetime.fromisoformat(self.state["start"]), datetime.fromisoformat(self.state["end"])
+
+    def pending(self, step, count):
+        done = set(self.state[step])
+        return [i for i in range(count) if i not in done]
+
+    def mark(self, step, i):
+        self.state[step].append(i)
+        self.save()
+
+    def save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.state, f)
+        os.replace(tmp, self.path)
 
-    # Preprocessing
-    df = clean_data(df)
-    df = add_real_aqi(df)  
-    df = cap_outliers(df)
+def _upsert_chunk(features, manifest, city, i):
+    """Upsert a featurized chunk and refresh the rollup buckets of its days"""
+    from feature_store.mongodb_store import upsert_features
+    from feature_store.rollups import update_rollups
+    df = features.read(i)
+    if not df.empty:
+        upsert_features(df)
+        update_rollups(city, df["timestamp"].min(), df["timestamp"].max())
+    manifest.mark("upserted", i)
+    return len(df)
 
-    # Feature Engineering
-    df = add_time_features(df)
-    df = add_cyclical_time_features(df)
-    df = add_lag_features(df)
-    df = add_rolling_features(df)
-    df = add_weather_interactions(df)
-    df = add_future_targets(df)
+@run_report("backfill")
+def run_backfill(city=CITY, days=BACKFILL_DAYS, chunk_days=BACKFILL_CHUNK_DAYS, processes=BACKFILL_PROCESSES, fresh=False):
+    # The feature store is imported here, not at module level: chunk_pool's
+    # spawned workers re-import the main module, and mongodb_store connects
+    # and creates its indexes on import
+    from feature_store.mongodb_store import load_selected_features
 
-    # Insert all rows
-    upsert_features(df)
-    print("Backfill completed successfully!")
+    location = get_city(city)
+
+    # Chunks and progress of an unfinished run survive in its work directory
+    work = os.path.join(BACKFILL_WORK_DIR, city)
+    manifest_path = os.path.join(work, "manifest.json")
+    manifest = None if fresh else BackfillManifest.load(manifest_path)
+    lags, rolls = feature_plan(load_selected_features() if PRUNE_UPSTREAM_FEATURES else None)
+
+    if manifest is not None and not manifest.matches(days, chunk_days, lags, rolls):
+        print("Unfinished backfill used other settings or features, starting over")
+        manifest = None
+    elif manifest is not None and manifest.age_hours() > BACKFILL_RESUME_MAX_HOURS:
+        # Resuming would leave a gap after its range that the hourly catch-up can't fill
+        print(f"Unfinished backfill ends {manifest.age_hours():.0f}h ago, starting over")
+        manifest = None
+
+    if manifest is not None:
+        start_dt, end_dt = manifest.window
+        print(f"Resuming the {city} backfill from {start_dt.date()} to {end_dt.date()}")
+    else:
+        shutil.rmtree(work, ignore_errors=True)
+        os.makedirs(work)
+        end_dt = datetime.now(timezone.utc)
+        start_dt = end_dt - timedelta(days=days)
+        manifest = BackfillManifest.create(manifest_path, city, days, chunk_days, lags, rolls, start_dt, end_dt)
+
+    windows = backfill_windows(start_dt, end_dt, chunk_days)
+    n = len(windows)
+    print(f"Backfilling {city} from {start_dt.date()} to {end_dt.date()} in {n} chunks")
+
+    # Only a few chunks are in memory at a time; the rest wait on local disk
+    raw = ChunkStore(os.path.join(work, "raw"))
+    cleaned = ChunkStore(os.path.join(work, "clean"))
+    features = ChunkStore(os.path.join(work, "features"))
+
+    # 1. Fetch each window once
+    for i in manifest.pending("fetched", n):
+        start, stop = windows[i]
+        raw.write(i, fetch_window(location, start, stop))
+        manifest.mark("fetched", i)
+
+    # Workers start once for both passes, and only if a pass has chunks left
+    with chunk_pool(processes) as pool:
+        # 2. Preprocessing (needs CLEAN_HALO raw rows around each chunk)
+        for i, _ in map_chunks(clean_task, manifest.pending("cleaned", n), pool, work, n):
+            manifest.mark("cleaned", i)
+
+        # Outlier caps are percentiles of the whole history: a few floats per hour.
+        # They are recomputed from every cleaned chunk, so resumed chunks get the same caps
+        caps = outlier_caps(collect_outlier_columns(cleaned, n))
+
+        # 3. Caps + features (history halo before, target halo after); chunks
+        # are upserted in order while the workers featurize the next ones
+        total = 0
+        for i, _ in map_chunks(featurize_task, manifest.pending("featurized", n), pool, work, n, caps, lags, rolls):
+            manifest.mark("featurized", i)
+            total += _upsert_chunk(features, manifest, city, i)
+
+    # Chunks featurized by an earlier run that stopped before upserting them
+    for i in manifest.pending("upserted", n):
+        total += _upsert_chunk(features, manifest, city, i)
+
+    # Finished: the next run is a new backfill
+    shutil.rmtree(work, ignore_errors=True)
+    print(f"Backfill completed successfully! ({total} rows upserted)")
 
 if __name__ == "__main__":
-    run_backfill()
+    parser = argparse.ArgumentParser(description="Backfill historical features for a city")
+    parser.add_argument("--city", default=CITY)
+    parser.add_argument("--days", type=int, default=BACKFILL_DAYS)
+    parser.add_argument("--chunk-days", type=int, default=BACKFILL_CHUNK_DAYS)
+    parser.add_argument("--processes", type=int, default=BACKFILL_PROCESSES, help="0 = one per core")
+    parser.add_argument("--fresh", action="store_true", help="discard an unfinished run instead of resuming it")
+    args = parser.parse_args()
+
+    run_backfill(args.city, args.days, args.chunk_days, args.processes or os.cpu_count(), args.fresh)
@@ -0,0 +1,111 @@
+import argparse
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+import mlflow
+import pandas as pd
+from dotenv import load_dotenv
+from mlflow.tracking import MlflowClient
+from models.backtest import prepare_history, realized_actuals, data_fingerprint, backtest_model
+from models.model_cache import load_model_version
+from feature_store.mongodb_store import load_features, load_backtest, save_backtest
+from monitoring.metrics import run_report
+from config.config import (
+    MODEL_NAME,
+    USE_COMPACT_PREDICTOR,
+    BACKTEST_WORKERS,
+    BACKTEST_BATCH_ROWS
+)
+
+load_dotenv()
+
+mlflow.set_tracking_uri(os.getenv("MLFLOW_TRACKING_URI"))
+os.environ["MLFLOW_TRACKING_USERNAME"] = os.getenv("MLFLOW_TRACKING_USERNAME")
+os.environ["MLFLOW_TRACKING_PASSWORD"] = os.getenv("MLFLOW_TRACKING_PASSWORD")
+
+def select_versions(versions=None):
+    """
+    Explicit versions, or by default today's candidates plus every version
+    that has been in Production (current and archived).
+    """
+    client = MlflowClient()
+    if versions:
+        return [client.get_model_version(MODEL_NAME, str(v)) for v in versions]
+
+    today = datetime.now(timezone.utc).date()
+    selected = []
+    for mv in client.search_model_versions(f"name='{MODEL_NAME}'"):
+        created = datetime.fromtimestamp(mv.creation_timestamp / 1000, tz=timezone.utc).date()
+        if mv.current_stage in ("Production", "Archived") or created == today:
+            selected.append(mv)
+    return sorted(selected, key=lambda mv: int(mv.version))
+
+@run_report("backtest")
+def run_backtest(versions=None, city=None):
+    print("Running historical backtest...")
+
+    df = prepare_history(load_features(city))
+    fingerprint = data_fingerprint(df)
+    print(f"{len(df)} forecast origins, data fingerprint {fingerprint[:12]}")
+
+    results, todo = {}, []
+    for mv in select_versions(versions):
+        cached = load_backtest(MODEL_NAME, mv.version, fingerprint)
+        if cached is not None:
+            print(f"Using cached backtest for version {mv.version}")
+            results[int(mv.version)] = cached
+        else:
+            todo.append(mv)
+
+    if todo:
+        actuals = realized_actuals(df)
+
+        # Load serially (shared on-disk cache), score in parallel
+        loaded = [(mv, *load_model_version(MODEL_NAME, mv, compact=USE_COMPACT_PREDICTOR)) for mv in todo]
+
+        def score(item):
+            mv, model, feature_names = item
+            trained_at = pd.Timestamp(mv.creation_timestamp, unit="ms", tz="UTC")
+            result = backtest_model(
+                model, feature_names, df, actuals, BACKTEST_BATCH_ROWS, out_of_sample_from=trained_at
+            )
+            doc = {
+                "model_name": MODEL_NAME,
+                "version": int(mv.version),
+                "fingerprint": fingerprint,
+                "city": city,
+                "stage": mv.current_stage,
+                "computed_at": datetime.now(timezone.utc),
+                **result
+            }
+            save_backtest(doc)
+            return int(mv.version), doc
+
+        with ThreadPoolExecutor(max_workers=BACKTEST_WORKERS) as pool:
+            for version, doc in pool.map(score, loaded):
+                print(f"Backtested version {version}")
+                results[version] = doc
+
+    report(results)
+    return results
+
+def report(results):
+    rows = []
+    for version, doc in sorted(results.items()):
+        for r in doc["by_horizon"]:
+            rows.append({"version": version, "stage": doc.get("stage"), **r})
+    if rows:
+        table = pd.DataFrame(rows).pivot_table(
+            index=["version", "stage"], columns="horizon", values="RMSE"
+        )
+        print("\nRMSE by horizon (hours):")
+        print(table.round(2).to_string())
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backtest model versions over stored history")
+    parser.add_argument("--versions", help="comma separated model versions (default: Production history + today's candidates)")
+    parser.add_argument("--city", help="restrict the history to one city")
+    args = parser.parse_args()
+
+    versions = [int(v) for v in args.versions.split(",")] if args.versions else None
+    run_backtest(versions, args.city)
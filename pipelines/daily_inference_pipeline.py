@@ -8,18 +8,31 @@ from dotenv import load_dotenv
 import mlflow
 import mlflow.sklearn
 from mlflow.tracking import MlflowClient
+from models import online_regressor
+from models.model_cache import get_production_version, load_model_version
+from monitoring.metrics import stage, run_report, add_bytes
+from feature_store.forecast_store import ensure_indexes, upsert_forecasts_many, latest_forecasts_many
+from feature_store.dashboard_snapshot import publish_after_inference
+from data_sources.rate_limit import limiter
+from config.cities import get_city
+from config.config import (
+    CITY,
+    MONGO_DB,
+    MONGO_COLLECTION,
+    INFERENCE_CITIES,
+    FORECASTS_COLLECTION,
+    ONLINE_STATE_COLLECTION,
+    ONLINE_BLEND_WEIGHT,
+    USE_COMPACT_PREDICTOR,
+    INFERENCE_MODE,
+    DIRECT_SMOOTH_ROWS,
+    INFERENCE_WINDOW_ROWS
+)
 
 load_dotenv()
 
 # ================== CONFIG ==================
 MONGO_URI = os.getenv("MONGO_URI")
-MONGO_DB = "aqi_prediction"
-FEATURES_COLLECTION = "features_karachi_hourly"
-PREDICTIONS_COLLECTION = "aqi_forecasts_daily"
-
-CITY = "Karachi"
-LAT = "24.8607"
-LON = "67.0011"
 OPENWEATHER_API_KEY = os.getenv("OPENWEATHER_API_KEY")
 
 mlflow.set_tracking_uri(os.getenv("MLFLOW_TRACKING_URI"))
@@ -28,50 +41,41 @@ os.environ["MLFLOW_TRACKING_PASSWORD"] = os.getenv("MLFLOW_TRACKING_PASSWORD")
 
 client = MongoClient(MONGO_URI)
 db = client[MONGO_DB]
-features_col = db[FEATURES_COLLECTION]
-preds_col = db[PREDICTIONS_COLLECTION]
+features_col = db[MONGO_COLLECTION]
+preds_col = db[FORECASTS_COLLECTION]
+online_state_col = db[ONLINE_STATE_COLLECTION]
 
 # ================== LOAD PRODUCTION MODEL ==================
+@stage()
 def load_production_model():
     model_name = "AQI_Forecast_Model"
-    mlflow_client = MlflowClient()
-
-    # Get Production version
-    for mv in mlflow_client.search_model_versions(f"name='{model_name}'"):
-        if mv.current_stage == "Production":
-            model_uri = f"models:/{model_name}/{mv.version}"
-            break
-    else:
-        raise ValueError("No Production model found!")
 
+    # Alias lookup + local versioned cache: a warm run downloads nothing
+    mv = get_production_version(model_name)
     print(f"Loading PRODUCTION model version {mv.version}")
-    model = mlflow.sklearn.load_model(model_uri)
 
-    # Load model signature
-    local_path = mlflow.artifacts.download_artifacts(model_uri)
-    model_meta = mlflow.models.Model.load(os.path.join(local_path, "MLmodel"))
-    signature = model_meta.signature
-    if signature is None:
-        raise ValueError("Model signature missing!")
-
-    feature_names = [col.name for col in signature.inputs]
-    return model, feature_names
+    # Prefers the NumPy-only predictor exported at promotion
+    model, feature_names = load_model_version(model_name, mv, compact=USE_COMPACT_PREDICTOR)
+    return model, feature_names, int(mv.version)
 
 # ================== FETCH FUTURE WEATHER ==================
-def fetch_weather_forecast():
+@stage("fetch_weather_forecast")
+def fetch_weather_forecast(lat, lon):
     """
     Fetch weather forecast for next 72 hours
     """
     url = "https://api.open-meteo.com/v1/forecast"
     params = {
-        "latitude": LAT,
-        "longitude": LON,
+        "latitude": lat,
+        "longitude": lon,
         "hourly": "temperature_2m,relativehumidity_2m,pressure_msl,windspeed_10m",
         "forecast_days": 3,
         "timezone": "UTC"
     }
+    limiter("open_meteo").acquire()
     resp = requests.get(url, params=params)
     resp.raise_for_status()
+    add_bytes(len(resp.content))
     data = resp.json()["hourly"]
     df = pd.DataFrame(data)
     df["timestamp"] = pd.to_datetime(df["time"], utc=True)
@@ -79,7 +83,7 @@ def fetch_weather_forecast():
     return df
 
 # ================== GENERATE FUTURE FEATURES ==================
-def generate_future_features(latest_df, hours=72):
+def generate_future_features(latest_df, hours=72, city=CITY):
     """
     Generate future hourly features for next N hours
     """
@@ -92,7 +96,8 @@ def generate_future_features(latest_df, hours=72):
     )
 
     # Fetch weather forecast
-    weather_df = fetch_weather_forecast()
+    location = get_city(city)
+    weather_df = fetch_weather_forecast(location["lat"], location["lon"])
     weather_future = weather_df[weather_df["timestamp"].isin(future_times)]
 
     # Create placeholder pollution columns (if no forecast, carry last known)
@@ -161,39 +166,173 @@ def predict_next_3_days(model, feature_names, latest_df):
 
     return daily_avg
 
+# ================== DIRECT MULTI-HORIZON ==================
+HORIZON_HOURS = [24, 48, 72]
+
+# Rows missing any of these aren't usable as a forecast origin
+REQUIRED_COLS = [
+    "pm2_5", "pm10", "no2", "so2", "o3", "co", "real_aqi",
+    "temperature_2m", "relativehumidity_2m",
+    "pressure_msl", "windspeed_10m"
+]
+
+def predict_direct(model, feature_names, latest_df, smooth_rows=DIRECT_SMOOTH_ROWS):
+    """
+    Score the latest complete feature row(s) once. Output column k is the
+    model's aqi_t_plus_{24(k+1)} target, so it maps straight to a date.
+    With smooth_rows > 1 the last N origins are averaged per horizon.
+    """
+    forecasts = predict_direct_multi(model, feature_names, {CITY: latest_df}, smooth_rows)
+    return forecasts.drop(columns=["city"])
+
+@stage("predict")
+def predict_direct_multi(model, feature_names, latest_by_city, smooth_rows=DIRECT_SMOOTH_ROWS):
+    """
+    Direct forecasts for many cities with a single predict call.
+    latest_by_city -> {city: recent feature rows}
+    Returns (city, date, avg_aqi) rows; cities without a complete row are skipped.
+    """
+    origins = []
+    for city, latest_df in latest_by_city.items():
+        complete = latest_df.dropna(subset=[c for c in REQUIRED_COLS if c in latest_df.columns])
+        if complete.empty:
+            print(f"No complete feature row for {city}, skipping")
+            continue
+        origins.append(complete.tail(smooth_rows).assign(city=city))
+
+    if not origins:
+        raise ValueError("No complete feature row to forecast from.")
+
+    recent = pd.concat(origins, ignore_index=True)
+    preds = np.clip(np.asarray(model.predict(recent.reindex(columns=feature_names))), 0, None)
+    print(f"Direct forecast for {len(origins)} city(s) from {len(recent)} row(s)")
+
+    # Average the smoothing rows per city, then date each horizon from the newest origin
+    horizon_cols = [f"h{h}" for h in HORIZON_HOURS]
+    scored = pd.DataFrame(preds, columns=horizon_cols)
+    scored["city"] = recent["city"]
+    avg = scored.groupby("city", sort=False)[horizon_cols].mean()
+    origin = recent.groupby("city", sort=False)["timestamp"].max()
+
+    rows = []
+    for city in avg.index:
+        for h, col in zip(HORIZON_HOURS, horizon_cols):
+            rows.append({
+                "city": city,
+                "date": (origin[city] + pd.Timedelta(hours=h)).normalize(),
+                "avg_aqi": avg.at[city, col]
+            })
+    return pd.DataFrame(rows)
+
+# ================== ROLLOUT (SYNTHETIC FUTURE ROWS) ==================
+@stage("predict_rollout")
+def predict_rollout(model, feature_names, latest_df, days_ahead):
+    """Legacy mode: score synthetic hourly future rows and average per day"""
+    # Generate hourly predictions only for required horizon
+    future_df = generate_future_features(latest_df, hours=24 * days_ahead)
+
+    X = future_df.reindex(columns=feature_names).ffill().bfill().fillna(0)
+
+    hourly_preds = model.predict(X)
+
+    # Fix for multi-output model
+    if len(hourly_preds.shape) > 1:
+        hourly_preds = hourly_preds.mean(axis=1)
+
+    hourly_preds = np.clip(hourly_preds, 0, None)
+    future_df["predicted_aqi"] = hourly_preds
+
+    # Aggregate daily
+    future_df["date"] = future_df["timestamp"].dt.normalize()
+    return (
+        future_df.groupby("date")["predicted_aqi"]
+        .mean()
+        .reset_index()
+        .rename(columns={"predicted_aqi": "avg_aqi"})
+    )
+
+# ================== BLEND ONLINE MODEL ==================
+@stage()
+def blend_online_forecast(daily_avg, latest_df, today, city=CITY):
+    """
+    Blend the hourly-updated online model into the batch forecast.
+    Day k ahead takes the online model's aqi_t_plus_{24k} prediction
+    from the latest feature row.
+    """
+    if ONLINE_BLEND_WEIGHT <= 0 or daily_avg.empty:
+        return daily_avg
+
+    state = online_state_col.find_one({"city": city}, {"_id": 0})
+    if state is None:
+        print("No online model state found, skipping blend")
+        return daily_avg
+
+    online_preds = online_regressor.predict(state, latest_df.tail(1))[0]
+    daily_avg = daily_avg.copy()
+
+    for i, h in enumerate(online_regressor.HORIZONS):
+        date = today + timedelta(hours=h)
+        mask = daily_avg["date"] == date
+        daily_avg.loc[mask, "avg_aqi"] = (
+            (1 - ONLINE_BLEND_WEIGHT) * daily_avg.loc[mask, "avg_aqi"]
+            + ONLINE_BLEND_WEIGHT * online_preds[i]
+        )
+
+    print(f"Blended online model forecast (weight={ONLINE_BLEND_WEIGHT})")
+    return daily_avg
+
 # ================== LOAD LATEST FEATURES ==================
-def get_latest_features():
-    df = pd.DataFrame(list(features_col.find().sort("timestamp", 1)))
+@stage("mongo_read_latest")
+def get_latest_features(columns=None, window=INFERENCE_WINDOW_ROWS, city=CITY):
+    """
+    Most recent `window` rows only, newest-first on the (city, timestamp)
+    index, so cost stays constant as the collection grows.
+    columns -> optional projection (e.g. the model signature columns)
+    """
+    projection = None
+    if columns is not None:
+        projection = {c: 1 for c in set(columns) | {"timestamp"}}
+        projection["_id"] = 0
+
+    cursor = (
+        features_col.find({"city": city}, projection)
+        .sort("timestamp", -1)
+        .limit(window)
+    )
+    df = pd.DataFrame(list(cursor))
     if df.empty:
         raise ValueError("No feature data found in MongoDB.")
     df["timestamp"] = pd.to_datetime(df["timestamp"], utc=True)
-    return df
+    return df.sort_values("timestamp").reset_index(drop=True)
 
 # ================== CHECK EXISTING PREDICTIONS ==================
-def check_existing_predictions():
+def check_existing_predictions(today, cities=INFERENCE_CITIES):
+    """Latest forecast for each of the next 3 days of every city (one query)"""
+    existing = latest_forecasts_many(preds_col, cities, today + timedelta(days=1), days=3)
+    if not existing.empty:
+        existing["date"] = pd.to_datetime(existing["date"], utc=True).dt.normalize()
+    return existing
+
+# ================== DASHBOARD SNAPSHOT ==================
+@stage()
+def publish_dashboard(cities):
+    # The dashboard falls back to live queries, so a failed publish must not fail inference
+    try:
+        publish_after_inference(cities)
+    except Exception as e:
+        print(f"Dashboard snapshot not published: {e}")
+
+# ================== RUN INFERENCE ==================
+@run_report("inference")
+def run_inference(cities=INFERENCE_CITIES):
     today = pd.Timestamp.utcnow().normalize()
     if today.tzinfo is None:
         today = today.tz_localize("UTC")
 
-    existing = list(
-        preds_col.find({"date": {"$gt": today}}).sort("date", 1)
-    )
-    return pd.DataFrame(existing)
-
-# ================== RUN INFERENCE ==================
-def run_inference():
-    today = pd.Timestamp.utcnow().normalize()
+    ensure_indexes(preds_col)
 
     # Get existing future predictions
-    existing = list(
-        preds_col.find({"date": {"$gt": today}}).sort("date", 1)
-    )
-    existing_df = pd.DataFrame(existing)
-
-    existing_dates = set()
-    if not existing_df.empty:
-        existing_df["date"] = pd.to_datetime(existing_df["date"]).dt.normalize()
-        existing_dates = set(existing_df["date"])
+    existing_df = check_existing_predictions(today, cities)
 
     # Required future dates (next 3 days strictly future)
     target_dates = [
@@ -202,60 +341,66 @@ def run_inference():
         today + timedelta(days=3),
     ]
 
-    missing_dates = [d for d in target_dates if d not in existing_dates]
+    missing = {}
+    for city in cities:
+        existing_dates = set()
+        if not existing_df.empty:
+            existing_dates = set(existing_df.loc[existing_df["city"] == city, "date"])
+        dates = [d for d in target_dates if d not in existing_dates]
+        if dates:
+            missing[city] = dates
 
-    if not missing_dates:
+    if not missing:
         print("Using cached predictions")
+        # Refresh anyway: training may have promoted a new model since
+        publish_dashboard(cities)
         return existing_df
 
-    print(f"Need to predict: {missing_dates}")
+    print(f"Need to predict: {missing}")
 
     # Load model once
-    model, feature_names = load_production_model()
-    latest_df = get_latest_features()
-
-    # We only predict up to the furthest missing day
-    max_missing_day = max(missing_dates)
-    days_ahead = (max_missing_day - today).days
-
-    # Generate hourly predictions only for required horizon
-    future_df = generate_future_features(latest_df, hours=24 * days_ahead)
-
-    X = future_df.reindex(columns=feature_names).ffill().bfill().fillna(0)
-    # hourly_preds = model.predict(X)
-    # future_df["predicted_aqi"] = np.clip(hourly_preds, 0, None)
-
-    hourly_preds = model.predict(X)
-
-    # Fix for multi-output model
-    if len(hourly_preds.shape) > 1:
-        hourly_preds = hourly_preds.mean(axis=1)
-
-    hourly_preds = np.clip(hourly_preds, 0, None)
-    future_df["predicted_aqi"] = hourly_preds
-
-    # Aggregate daily
-    future_df["date"] = future_df["timestamp"].dt.normalize()
-    daily_avg = (
-        future_df.groupby("date")["predicted_aqi"]
-        .mean()
-        .reset_index()
-        .rename(columns={"predicted_aqi": "avg_aqi"})
-    )
-
-    # Keep only missing ones
-    daily_avg = daily_avg[daily_avg["date"].isin(missing_dates)]
+    model, feature_names, model_version = load_production_model()
+    # The online model may use columns outside the signature
+    columns = None if ONLINE_BLEND_WEIGHT > 0 else feature_names + REQUIRED_COLS
+    # A city without features yet (e.g. just added, not backfilled) is
+    # reported and skipped; the other cities are still forecast
+    latest_by_city, empty = {}, []
+    for city in missing:
+        try:
+            latest_by_city[city] = get_latest_features(columns, city=city)
+        except ValueError:
+            empty.append(city)
+    if empty:
+        print(f"No feature data for {', '.join(empty)}, skipping")
+    if not latest_by_city:
+        raise ValueError("No feature data found in MongoDB.")
 
-    if not daily_avg.empty:
-        daily_avg["date"] = pd.to_datetime(daily_avg["date"]).dt.to_pydatetime()
-        preds_col.insert_many(daily_avg.to_dict("records"))
-        print("Inserted only missing forecast days")
+    if INFERENCE_MODE == "direct":
+        # One matrix, one predict call for every city
+        forecasts = predict_direct_multi(model, feature_names, latest_by_city)
+    else:
+        # Rollout needs per-city weather; only the configured city has coordinates
+        if set(missing) != {CITY}:
+            raise ValueError(f"Rollout mode only supports {CITY}; use INFERENCE_MODE=direct")
+        # We only predict up to the furthest missing day
+        max_missing_day = max(missing[CITY])
+        days_ahead = (max_missing_day - today).days
+        forecasts = predict_rollout(model, feature_names, latest_by_city[CITY], days_ahead)
+        forecasts["city"] = CITY
+
+    blended = []
+    for city, daily_avg in forecasts.groupby("city", sort=False):
+        # Keep only missing ones
+        daily_avg = daily_avg[daily_avg["date"].isin(missing[city])]
+        blended.append(blend_online_forecast(daily_avg, latest_by_city[city], today, city))
+    forecasts = pd.concat(blended, ignore_index=True)
+
+    # Keyed upsert for all cities in one bulk write; re-runs overwrite, never duplicate
+    upsert_forecasts_many(preds_col, forecasts, model_version)
+    publish_dashboard(cities)
 
     # Return updated 3-day window
-    final = list(
-        preds_col.find({"date": {"$gt": today}}).sort("date", 1)
-    )
-    return pd.DataFrame(final)
+    return check_existing_predictions(today, cities)
 
 # ================== MAIN ==================
 if __name__ == "__main__":
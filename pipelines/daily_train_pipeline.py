@@ -1,38 +1,69 @@
-import subprocess
-import sys
+import argparse
 import os
-import mlflow
-import mlflow.sklearn
-import numpy as np
-from sklearn.metrics import mean_absolute_error, mean_squared_error
-import models.train_random_forest as rf
-import models.train_lightgbm as lgbm
-import models.train_xgboost as xgb
-import models.train_linear as lr
-import os
-from mlflow.models.signature import infer_signature
-from mlflow.tracking import MlflowClient
-import mlflow
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import pandas as pd
 from dotenv import load_dotenv
-from features.feature_engineering import add_future_targets
+# Trainer modules (xgboost, lightgbm, ...) are imported only when selected.
+# MLflow, sklearn and the feature store (which connects to Mongo on import)
+# are imported by the functions using them, so --list needs neither
+from models.registry import available_trainers, select_trainers
+from monitoring.metrics import stage, run_report
+from config.config import (
+    MODEL_NAME,
+    MLFLOW_LOG_MODE,
+    SIGNATURE_SAMPLE_ROWS,
+    COMPACT_PREDICTOR_PATH,
+    PRODUCTION_ALIAS,
+    TRAIN_HOLDOUT_HOURS
+)
 
 load_dotenv()
 
-mlflow.set_tracking_uri(os.getenv("MLFLOW_TRACKING_URI"))
-os.environ["MLFLOW_TRACKING_USERNAME"] = os.getenv("MLFLOW_TRACKING_USERNAME")
-os.environ["MLFLOW_TRACKING_PASSWORD"] = os.getenv("MLFLOW_TRACKING_PASSWORD")
+TARGET_COLS = ["aqi_t_plus_24", "aqi_t_plus_48", "aqi_t_plus_72"]
 
-print("MLflow Tracking URI:", mlflow.get_tracking_uri())
+class TrainingRun:
+    """
+    State of one run_training call, so the scheduler can train again in the
+    same process.
 
-TARGET_COLS = ["aqi_t_plus_24", "aqi_t_plus_48", "aqi_t_plus_72"]
+    candidates maps the keys returned by log_model to (model, run_id,
+    sample), so the promoted one can be exported without downloading it
+    again. In fast logging mode every candidate is uploaded and registered
+    in the background while the next ones train; log_model then returns
+    run ids, which registered_versions() turns into versions.
+    """
+
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(max_workers=1) if MLFLOW_LOG_MODE == "fast" else None
+        self.pending = {}
+        self.candidates = {}
+
+    def registered_versions(self, versions_this_run):
+        """Wait for the background registrations; re-key everything by version"""
+        if self.executor is None:
+            return versions_this_run
+        versions = {run_id: future.result() for run_id, future in self.pending.items()}
+        self.candidates = {versions[k]: c for k, c in self.candidates.items()}
+        return [(versions[k], rmse) for k, rmse in versions_this_run]
 
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+
+@stage()
 def prepare_data(df):
-    df = df.sort_values("timestamp")
+    from features.feature_engineering import add_future_targets
+    from feature_store.mongodb_store import load_selected_features
 
-    if "aqi_t_plus_24" not in df.columns:
-        df = add_future_targets(df)
+    # Labels are always rebuilt from real_aqi: the hourly ingest stores rows
+    # without them, and stored ones go stale as newer hours arrive
+    df = add_future_targets(df.drop(columns=TARGET_COLS, errors="ignore"))
 
     df = df.dropna(subset=TARGET_COLS)
+    # Rows keep their timestamp as index so windows can be taken in hours
+    df = df.set_index("timestamp", drop=False)
 
     drop_cols = [
         "timestamp",
@@ -40,33 +71,37 @@ def prepare_data(df):
         "us_aqi",   
         "aqi_t_plus_24",
         "aqi_t_plus_48",
-        "aqi_t_plus_72",
-        'pm2_5_lag_12',      # Low SHAP value
-        'aqi_lag_24h',       # Redundant
-        'hour_cos',          # Low importance
-        'day_of_week',       # Low importance
-        'dow_sin',           # Low importance
-        'dow_cos',           # Low importance
-        'pm2_5_roll_mean_24',# Low importance
-        'pm2_5_lag_72',      # Low importance
-        'AQI_24h_avg',       # Redundant
-        'month'              # Low importance
+        "aqi_t_plus_72"
     ]
 
     X = df.drop(columns=[c for c in drop_cols if c in df.columns])
+
+    # Feature subset picked by pipelines.feature_selection_pipeline
+    selected = load_selected_features()
+    if selected:
+        X = X[[c for c in selected if c in X.columns]]
+
     y = df[TARGET_COLS]
 
-    split_index = int(len(df) * 0.8)
-    X_train, X_test = X.iloc[:split_index], X.iloc[split_index:]
-    y_train, y_test = y.iloc[:split_index], y.iloc[split_index:]
+    # Shared holdout: the newest TRAIN_HOLDOUT_HOURS, whatever the trainer
+    test = X.index > X.index.max() - pd.Timedelta(hours=TRAIN_HOLDOUT_HOURS)
+    X_train, X_test = X[~test], X[test]
+    y_train, y_test = y[~test], y[test]
 
     return X_train, X_test, y_train, y_test
 
-def log_model(model, run_name, params, X_train, y_test, preds):
+@stage()
+def log_model(state, model, run_name, params, X_train, y_test, preds):
+    import mlflow
+    import mlflow.sklearn
+    import numpy as np
+    from mlflow.models.signature import infer_signature
+    from sklearn.metrics import mean_absolute_error, mean_squared_error
+
     horizons = ["24h", "48h", "72h"]
     rmses = []
 
-    with mlflow.start_run(run_name=run_name) as run:
+    with mlflow.start_run(run_name=run_name) as mlflow_run:
 
         for k, v in params.items():
             mlflow.log_param(k, v)
@@ -81,31 +116,132 @@ def log_model(model, run_name, params, X_train, y_test, preds):
         avg_rmse = float(np.mean(rmses))
         mlflow.log_metric("RMSE_avg", avg_rmse)
 
-        signature = infer_signature(X_train, model.predict(X_train))
+        # Signature only needs the schema, a small sample is enough. The
+        # newest rows are also the compact predictor's parity sample, so it
+        # is checked on the value ranges inference will see
+        sample = X_train.tail(SIGNATURE_SAMPLE_ROWS)
+        signature = infer_signature(sample, model.predict(sample))
+
+        if MLFLOW_LOG_MODE == "fast":
+            run_id = mlflow_run.info.run_id
+            state.candidates[run_id] = (model, run_id, sample)
+            state.pending[run_id] = state.executor.submit(
+                upload_and_register, run_id, model, signature, sample.tail(1)
+            )
+
+            print(f" Logged {run_name} metrics (AVG_RMSE={avg_rmse:.4f}), registering in the background")
+            return run_id, avg_rmse
 
         model_info = mlflow.sklearn.log_model(
             sk_model=model,
             name="model",
             signature=signature,
-            input_example=X_train.head(1)
+            input_example=sample.tail(1)
         )
 
         mv = mlflow.register_model(
             model_uri=model_info.model_uri,
-            name="AQI_Forecast_Model"
+            name=MODEL_NAME
         )
 
         print(f" Registered {run_name} as version {mv.version} (AVG_RMSE={avg_rmse:.4f})")
 
+        state.candidates[int(mv.version)] = (model, mlflow_run.info.run_id, sample)
         return int(mv.version), avg_rmse
 
-def promote_best_of_today(versions_this_run):
+def upload_model(run_id, model, signature, input_example):
+    """
+    Save the model locally and upload it into an existing run.
+    Uses the thread-safe client API so it can run in the background.
+    """
+    import mlflow.sklearn
+    from mlflow.tracking import MlflowClient
+
+    with tempfile.TemporaryDirectory() as tmp:
+        local_path = os.path.join(tmp, "model")
+        mlflow.sklearn.save_model(
+            sk_model=model,
+            path=local_path,
+            signature=signature,
+            input_example=input_example
+        )
+        MlflowClient().log_artifacts(run_id, local_path, artifact_path="model")
+    return f"runs:/{run_id}/model"
+
+def upload_and_register(run_id, model, signature, input_example):
+    """Fast mode: upload a candidate into its run, then register it"""
+    import mlflow
+
+    mv = mlflow.register_model(
+        model_uri=upload_model(run_id, model, signature, input_example),
+        name=MODEL_NAME
+    )
+    print(f" Registered candidate run {run_id} as version {mv.version}")
+    return int(mv.version)
+
+@stage()
+def export_compact_predictor(model, run_id, X_sample):
+    """
+    Compile the promoted model into a NumPy-only predictor and log it
+    next to the model in its run. Skipped if it doesn't match the model.
+    """
+    from mlflow.tracking import MlflowClient
+    from models.compact_predictor import CompactPredictor, compile_model, check_parity
+
+    try:
+        predictor = CompactPredictor(compile_model(model, list(X_sample.columns)))
+    except ValueError as e:
+        print(f" Compact predictor export skipped: {e}")
+        return
+
+    ok, max_diff = check_parity(model, predictor, X_sample)
+    client = MlflowClient()
+    client.log_metric(run_id, "compact_parity_max_diff", max_diff)
+    if not ok:
+        print(f" Compact predictor parity check failed (max diff {max_diff:.6f}), not exported")
+        return
+
+    artifact_dir, file_name = os.path.split(COMPACT_PREDICTOR_PATH)
+    with tempfile.TemporaryDirectory() as tmp:
+        local_path = os.path.join(tmp, file_name)
+        predictor.save(local_path)
+        client.log_artifact(run_id, local_path, artifact_path=artifact_dir)
+
+    print(f" Exported compact predictor (parity max diff {max_diff:.6f})")
+
+def log_replaced_live_accuracy(client, run_id):
+    """
+    Live accuracy of the Production version being replaced (all cities),
+    logged on the promoted run so the two can be compared. A new candidate
+    has no live record yet, so the choice itself stays on offline RMSE.
+    """
+    from feature_store.mongodb_store import load_accuracy
+
+    try:
+        current = client.get_model_version_by_alias(MODEL_NAME, PRODUCTION_ALIAS).version
+    except Exception:
+        return
+    live = load_accuracy(model_version=current)
+    for r in live.itertuples():
+        client.log_metric(run_id, f"replaced_live_MAE_{r.horizon}h", r.MAE)
+        client.log_metric(run_id, f"replaced_live_RMSE_{r.horizon}h", r.RMSE)
+        print(f"   Replaced v{current} live {r.horizon}h: MAE {r.MAE:.2f}, RMSE {r.RMSE:.2f} over {r.n} forecasts")
+
+@stage()
+def promote_best_of_today(state, versions_this_run):
+    from mlflow.tracking import MlflowClient
+
     client = MlflowClient()
-    model_name = "AQI_Forecast_Model"
+    model_name = MODEL_NAME
 
     # pick lowest RMSE from today’s models only
     best_version, best_rmse = min(versions_this_run, key=lambda x: x[1])
 
+    # Export before promoting so inference never sees a Production
+    # version without its compact predictor
+    export_compact_predictor(*state.candidates[best_version])
+    log_replaced_live_accuracy(client, state.candidates[best_version][1])
+
     client.transition_model_version_stage(
         name=model_name,
         version=str(best_version),
@@ -113,25 +249,62 @@ def promote_best_of_today(versions_this_run):
         archive_existing_versions=True
     )
 
+    # Alias lets inference find Production with a single lookup
+    client.set_registered_model_alias(model_name, PRODUCTION_ALIAS, str(best_version))
+
     print(f"\n BEST MODEL SELECTED")
     print(f"   ➜ Version: {best_version}")
     print(f"   ➜ Avg RMSE: {best_rmse:.4f}")
     print("   ➜ Promoted to PRODUCTION\n")
 
-# PIPELINE: RUN ALL MODELS
-versions_this_run = []
+def configure_mlflow():
+    import mlflow
+
+    # Credentials are read from MLFLOW_TRACKING_USERNAME / _PASSWORD by mlflow itself
+    mlflow.set_tracking_uri(os.getenv("MLFLOW_TRACKING_URI"))
+    print("MLflow Tracking URI:", mlflow.get_tracking_uri())
+
+# PIPELINE: RUN THE SELECTED MODELS (default: all registered)
+@run_report("training")
+def run_training(models=None, promote=None):
+    # Resolve (and import) the trainers first, so a typo fails before any training
+    trainers = select_trainers(models)
+
+    # The winner archives the current Production version, so by default only
+    # a run over every registered candidate may promote; a subset (e.g. just
+    # ridge) would otherwise replace a better model that wasn't retrained
+    if promote is None:
+        promote = {name for name, _ in trainers} == set(available_trainers())
+        if not promote:
+            print("Training a subset of the candidates: not promoting (pass --promote to force)")
+    configure_mlflow()
 
-v, rmse = rf.train_model(prepare_data, log_model)
-versions_this_run.append((v, rmse))
+    state = TrainingRun()
+    try:
+        versions_this_run = []
+        for name, train_model in trainers:
+            v, rmse = train_model(prepare_data, partial(log_model, state))
+            versions_this_run.append((v, rmse))
+        versions_this_run = state.registered_versions(versions_this_run)
+    finally:
+        state.close()
 
-v, rmse = lgbm.train_model(prepare_data, log_model)
-versions_this_run.append((v, rmse))
+    if promote:
+        promote_best_of_today(state, versions_this_run)
 
-v, rmse = xgb.train_model(prepare_data, log_model)
-versions_this_run.append((v, rmse))
+    return versions_this_run
 
-v, rmse = lr.train_model(prepare_data, log_model)
-versions_this_run.append((v, rmse))
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train candidate models and promote the best one")
+    parser.add_argument("--models", help=f"comma separated candidates (default: all of {', '.join(available_trainers())})")
+    parser.add_argument("--list", action="store_true", help="list the registered candidates and exit")
+    promotion = parser.add_mutually_exclusive_group()
+    promotion.add_argument("--promote", action="store_true", default=None, help="promote the best candidate even when --models is a subset")
+    promotion.add_argument("--no-promote", action="store_false", dest="promote", help="log the candidates without promoting one to Production")
+    args = parser.parse_args()
 
-# promote_best_model()
-promote_best_of_today(versions_this_run)
+    if args.list:
+        print("\n".join(available_trainers()))
+    else:
+        models = [m.strip() for m in args.models.split(",") if m.strip()] if args.models else None
+        run_training(models, promote=args.promote)
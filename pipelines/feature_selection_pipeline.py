@@ -0,0 +1,110 @@
+import os
+from datetime import datetime, timezone
+import mlflow
+from dotenv import load_dotenv
+from sklearn.base import clone
+from models.feature_selection import compute_shap_importances, select_min_features
+from models.model_cache import get_production_version, load_model_version
+from models.warm_start import is_full_refit_day
+from monitoring.metrics import run_report
+from feature_store.mongodb_store import (
+    load_features,
+    load_shap_importances,
+    save_shap_importances,
+    save_feature_selection
+)
+from config.config import (
+    MODEL_NAME,
+    SHAP_SAMPLE_ROWS,
+    SHAP_BATCH_SIZE,
+    SHAP_WORKERS,
+    FEATURE_RMSE_TOLERANCE
+)
+
+load_dotenv()
+
+mlflow.set_tracking_uri(os.getenv("MLFLOW_TRACKING_URI"))
+os.environ["MLFLOW_TRACKING_USERNAME"] = os.getenv("MLFLOW_TRACKING_USERNAME")
+os.environ["MLFLOW_TRACKING_PASSWORD"] = os.getenv("MLFLOW_TRACKING_PASSWORD")
+
+TARGET_COLS = ["aqi_t_plus_24", "aqi_t_plus_48", "aqi_t_plus_72"]
+NON_FEATURE_COLS = ["timestamp", "city", "us_aqi"] + TARGET_COLS
+
+def load_production_model():
+    mv = get_production_version(MODEL_NAME)
+    model, _ = load_model_version(MODEL_NAME, mv, compact=False)
+    return model, int(mv.version)
+
+@run_report("feature_selection")
+def run_feature_selection():
+    print("Running SHAP feature selection...")
+
+    model, version = load_production_model()
+    feature_names = list(model.feature_names_in_)
+
+    df = load_features().dropna(subset=TARGET_COLS)
+    y = df[TARGET_COLS]
+
+    # Candidates are every stored feature, not just the ones the model uses
+    all_features = [
+        c for c in df.select_dtypes(include="number").columns
+        if c not in NON_FEATURE_COLS
+    ]
+    X = df[all_features]
+
+    split_index = int(len(df) * 0.8)
+
+    # Production only knows the features it was trained on, so ranking its
+    # SHAP values can only ever shrink the set. On full refit days a copy is
+    # refit on every stored feature and that is ranked instead, so features
+    # dropped earlier can be selected again
+    rescore_all = is_full_refit_day()
+    if rescore_all:
+        print(f"Full refit day: ranking all {len(all_features)} stored features")
+        ranker = clone(model).fit(X.iloc[:split_index], y.iloc[:split_index])
+        importances = compute_shap_importances(
+            ranker,
+            X.tail(SHAP_SAMPLE_ROWS),
+            batch_size=SHAP_BATCH_SIZE,
+            workers=SHAP_WORKERS
+        )
+    else:
+        # SHAP importances are cached per model version
+        importances = load_shap_importances(MODEL_NAME, version)
+        if importances is None:
+            print(f"Computing SHAP importances for version {version}")
+            importances = compute_shap_importances(
+                model,
+                X.reindex(columns=feature_names).tail(SHAP_SAMPLE_ROWS),
+                batch_size=SHAP_BATCH_SIZE,
+                workers=SHAP_WORKERS
+            )
+            save_shap_importances(MODEL_NAME, version, importances)
+        else:
+            print(f"Using cached SHAP importances for version {version}")
+
+    features, full_rmse, selected_rmse = select_min_features(
+        model,
+        importances,
+        X.iloc[:split_index], y.iloc[:split_index],
+        X.iloc[split_index:], y.iloc[split_index:],
+        tolerance=FEATURE_RMSE_TOLERANCE
+    )
+
+    save_feature_selection({
+        "model_name": MODEL_NAME,
+        "source_version": version,
+        "ranked_all_features": rescore_all,
+        "features": features,
+        "rmse_all_features": full_rmse,
+        "rmse_selected": selected_rmse,
+        "tolerance": FEATURE_RMSE_TOLERANCE,
+        "created_at": datetime.now(timezone.utc)
+    })
+
+    print(f"Selected {len(features)}/{len(all_features)} features "
+          f"(RMSE {selected_rmse:.4f} vs {full_rmse:.4f} with all features)")
+    return features
+
+if __name__ == "__main__":
+    run_feature_selection()
@@ -10,26 +10,49 @@ from features.feature_engineering import (
     add_lag_features,
     add_rolling_features,
     add_weather_interactions,
-    add_future_targets
+    add_future_targets,
+    feature_plan
 )
 from features.feature_engineering import add_real_aqi
-from feature_store.mongodb_store import upsert_features, load_recent_history
-from config.config import CITY, LAT, LON, OPENWEATHER_API_KEY
+from feature_store.mongodb_store import (
+    upsert_features,
+    load_recent_history,
+    latest_timestamp,
+    load_online_state,
+    save_online_state,
+    load_selected_features
+)
+from feature_store.dashboard_snapshot import publish_after_ingest
+from feature_store.rollups import update_rollups
+from data_sources.rate_limit import limiter
+from models import online_regressor
+from monitoring.metrics import stage, run_report, add_bytes
+from config.cities import get_city
+from config.config import (
+    CITY,
+    OPENWEATHER_API_KEY,
+    INGEST_CATCHUP_MAX_HOURS,
+    ONLINE_LEARNING_RATE,
+    PRUNE_UPSTREAM_FEATURES
+)
 
 load_dotenv()
 
-def fetch_pollution_last_hour(start_unix, end_unix):
+@stage("fetch_pollution")
+def fetch_pollution_window(start_unix, end_unix, lat, lon):
     url = "http://api.openweathermap.org/data/2.5/air_pollution/history"
     params = {
-        "lat": LAT,
-        "lon": LON,
+        "lat": lat,
+        "lon": lon,
         "start": start_unix,
         "end": end_unix,
         "appid": OPENWEATHER_API_KEY
     }
 
+    limiter("openweather").acquire()
     response = requests.get(url, params=params)
     response.raise_for_status()
+    add_bytes(len(response.content))
     data = response.json()["list"]
 
     rows = []
@@ -50,18 +73,21 @@ def fetch_pollution_last_hour(start_unix, end_unix):
 
     return pd.DataFrame(rows)
 
-def fetch_weather_last_hour():
+@stage("fetch_weather")
+def fetch_weather_recent(lat, lon, past_hours=2):
     url = "https://api.open-meteo.com/v1/forecast"
     params = {
-        "latitude": LAT,
-        "longitude": LON,
+        "latitude": lat,
+        "longitude": lon,
         "hourly": "temperature_2m,relativehumidity_2m,pressure_msl,windspeed_10m",
-        "past_hours": 2,        
+        "past_hours": past_hours,
         "timezone": "UTC"
     }
 
+    limiter("open_meteo").acquire()
     response = requests.get(url, params=params)
     response.raise_for_status()
+    add_bytes(len(response.content))
 
     data = response.json()["hourly"]
     df = pd.DataFrame(data)
@@ -70,23 +96,62 @@ def fetch_weather_last_hour():
 
     return df
 
-def run_hourly_ingestion():
-    print("Running hourly AQI ingestion...")
+@stage()
+def update_online_model(df, city=CITY):
+    """
+    Feed newly matured aqi_t_plus_* targets to the online model.
+    df holds the recent history plus the new rows with features computed.
+    """
+    state = load_online_state(city)
+    if state is None:
+        state = online_regressor.init_state(city, online_regressor.select_features(df))
+
+    state = online_regressor.learn_from_new_rows(state, df, ONLINE_LEARNING_RATE)
+    save_online_state(state)
+
+    print(f"Online model updated (updates per horizon: {state['n_updates']})")
+
+def catchup_start(city, now):
+    """
+    First hour to ingest: the previous hour normally, or the hour after the
+    latest stored one when runs were missed (capped at INGEST_CATCHUP_MAX_HOURS)
+    """
+    start = now - timedelta(hours=1)
+    latest = latest_timestamp(city)
+    if latest is None:
+        return start
+
+    oldest = now - timedelta(hours=INGEST_CATCHUP_MAX_HOURS)
+    missing_from = latest.to_pydatetime() + timedelta(hours=1)
+    if missing_from < oldest:
+        print(f"{city} is missing data since {latest}; catching up the last {INGEST_CATCHUP_MAX_HOURS}h only, run the backfill for the rest")
+    return max(oldest, min(start, missing_from))
+
+@run_report("hourly_ingest")
+def run_hourly_ingestion(city=CITY):
+    location = get_city(city)
+    print(f"Running hourly AQI ingestion for {city}...")
 
     now = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
     end_time = now
-    start_time = now - timedelta(hours=1)
+    start_time = catchup_start(city, now)
+    gap_hours = int((end_time - start_time) / timedelta(hours=1))
+    if gap_hours > 1:
+        print(f"Catching up {gap_hours} hours from {start_time}")
 
-    pollution_df = fetch_pollution_last_hour(
+    # One request per source covers the whole gap
+    pollution_df = fetch_pollution_window(
         int(start_time.timestamp()),
-        int(end_time.timestamp())
+        int(end_time.timestamp()),
+        location["lat"],
+        location["lon"]
     ).drop_duplicates(subset=["timestamp"])
 
     if pollution_df.empty:
         print("No pollution data returned. Skipping...")
         return
 
-    weather_df = fetch_weather_last_hour()
+    weather_df = fetch_weather_recent(location["lat"], location["lon"], past_hours=gap_hours + 2)
 
     df = pd.merge_asof(
         pollution_df.sort_values("timestamp"),
@@ -96,11 +161,18 @@ def run_hourly_ingestion():
         tolerance=pd.Timedelta("30min")
     )
 
-    df["city"] = CITY
+    df["city"] = city
 
-    history_df = load_recent_history(hours=200, city=CITY)
+    # Lag / rolling context for the oldest missing hour
+    history_df = load_recent_history(hours=200 + gap_hours, city=city)
 
-    df = pd.concat([history_df, df]).sort_values("timestamp").reset_index(drop=True)
+    # Freshly fetched hours replace stored ones, so lags see one row per hour
+    df = (
+        pd.concat([history_df, df])
+        .drop_duplicates(subset=["timestamp"], keep="last")
+        .sort_values("timestamp")
+        .reset_index(drop=True)
+    )
 
     #  PREPROCESS 
     df = clean_data(df)
@@ -110,16 +182,15 @@ def run_hourly_ingestion():
     #  FEATURES 
     df = add_time_features(df)
     df = add_cyclical_time_features(df)
-    df = add_lag_features(df)
-    df = add_rolling_features(df)
+    lags, windows = feature_plan(load_selected_features() if PRUNE_UPSTREAM_FEATURES else None)
+    df = add_lag_features(df, lags)
+    df = add_rolling_features(df, windows)
     df = add_weather_interactions(df)
 
     # Keep only newest rows & drop incomplete feature rows
     # df = df[df["timestamp"] >= start_time]
     # df = df.dropna()
 
-    df = df[df["timestamp"] >= start_time]
-
     # Only drop rows missing CORE values, not lag features
     required_cols = [
         "pm2_5", "pm10", "no2", "so2", "o3", "co",
@@ -129,9 +200,23 @@ def run_hourly_ingestion():
 
     df = df.dropna(subset=required_cols)
 
+    # The online model learns from the rows that get stored (the history is
+    # kept as the origins of the targets that matured)
+    update_online_model(df, city)
+
+    df = df[df["timestamp"] >= start_time]
+
     upsert_features(df)
 
     print(f"Inserted/Updated {len(df)} hourly records successfully!")
 
+    # Dashboard data is derived and rebuilt by backfill, so it must not fail ingestion
+    try:
+        # Rollups first: the snapshot version bump tells the app to re-read them
+        update_rollups(city, df["timestamp"].min(), df["timestamp"].max())
+        publish_after_ingest(city)
+    except Exception as e:
+        print(f"Dashboard data not refreshed: {e}")
+
 if __name__ == "__main__":
     run_hourly_ingestion()
@@ -0,0 +1,112 @@
+"""
+Multi-city fan-out for the scheduled jobs.
+
+    python -m pipelines.scheduler ingest
+    python -m pipelines.scheduler accuracy --cities Karachi,Lahore
+    python -m pipelines.scheduler inference --workers 16
+    python -m pipelines.scheduler training
+    python -m pipelines.scheduler backfill --workers 2
+
+Cities come from the registry (config/cities.py). Per-city work runs on a
+bounded thread pool: it is API and Mongo bound, and the provider rate
+limits (data_sources/rate_limit.py) are shared by all threads. A failing
+city is reported and the others still run; the exit code is non-zero if
+any city failed.
+"""
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from config.cities import select_cities
+from config.config import SCHEDULER_WORKERS, INFERENCE_CHUNK_SIZE
+from monitoring.metrics import run_report, timed
+
+JOBS = ("ingest", "accuracy", "inference", "training", "backfill")
+
+def fan_out(job, units, fn, workers, label=str):
+    """Run fn(unit) for every unit on at most `workers` threads, isolating failures"""
+    def run(unit):
+        name = label(unit)
+        started = time.perf_counter()
+        try:
+            with timed(f"{job}:{name}"):
+                fn(unit)
+            status, error = "ok", None
+        except Exception as e:
+            print(f"[{job}] {name} failed: {e!r}")
+            status, error = "failed", repr(e)
+        return {"unit": name, "status": status, "seconds": time.perf_counter() - started, "error": error}
+
+    if not units:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(units))), thread_name_prefix=job) as pool:
+        return list(pool.map(run, units))
+
+# ================== JOBS ==================
+def ingest_job(cities, workers):
+    from pipelines.hourly_ingest_pipeline import run_hourly_ingestion
+    return fan_out("ingest", cities, run_hourly_ingestion, workers)
+
+def accuracy_job(cities, workers):
+    from pipelines.accuracy_pipeline import run_accuracy_update
+    return fan_out("accuracy", cities, run_accuracy_update, workers)
+
+def inference_job(cities, workers):
+    from pipelines.daily_inference_pipeline import run_inference, load_production_model
+
+    # Fill the local model cache once; the chunks then load it from disk
+    load_production_model()
+
+    # Each chunk loads its cities' features and predicts them in one call
+    chunks = [cities[i:i + INFERENCE_CHUNK_SIZE] for i in range(0, len(cities), INFERENCE_CHUNK_SIZE)]
+    results = fan_out("inference", chunks, run_inference, workers, label=", ".join)
+
+    # A failed chunk is retried city by city, so one bad city can't sink the others
+    retry = [[c] for r, chunk in zip(results, chunks) if r["status"] == "failed" and len(chunk) > 1 for c in chunk]
+    if retry:
+        results = [r for r, chunk in zip(results, chunks) if r["status"] == "ok" or len(chunk) == 1]
+        results += fan_out("inference", retry, run_inference, workers, label=", ".join)
+    return results
+
+def training_job(cities, workers):
+    # One model is trained on the features of every city, so there is
+    # nothing to fan out: a single isolated unit
+    from pipelines.daily_train_pipeline import run_training
+    return fan_out("training", ["all cities"], lambda _: run_training(), 1)
+
+def backfill_job(cities, workers):
+    # Each backfill streams its city in chunks, so memory grows with workers, not cities
+    from pipelines.backfill_pipeline import run_backfill
+    return fan_out("backfill", cities, run_backfill, workers)
+
+def run_job(job, cities=None, workers=SCHEDULER_WORKERS):
+    names = [c["name"] for c in select_cities(cities)]
+    jobs = {
+        "ingest": ingest_job,
+        "accuracy": accuracy_job,
+        "inference": inference_job,
+        "training": training_job,
+        "backfill": backfill_job
+    }
+
+    print(f"Running {job} for {len(names)} cities on {workers} workers")
+    started = time.perf_counter()
+    # All per-city runs are stages of one report for the whole fan-out
+    results = run_report(f"scheduler_{job}")(jobs[job])(names, workers)
+
+    failed = [r for r in results if r["status"] == "failed"]
+    print(f"\n{job}: {len(results) - len(failed)} ok, {len(failed)} failed in {time.perf_counter() - started:.1f}s")
+    for r in sorted(results, key=lambda r: r["seconds"], reverse=True):
+        print(f"  {r['unit']:<32} {r['status']:<7} {r['seconds']:8.2f}s  {r['error'] or ''}")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a scheduled job for every registered city")
+    parser.add_argument("job", choices=JOBS)
+    parser.add_argument("--cities", help="comma separated city names (default: every registered city)")
+    parser.add_argument("--workers", type=int, default=SCHEDULER_WORKERS)
+    args = parser.parse_args()
+
+    cities = [c.strip() for c in args.cities.split(",") if c.strip()] if args.cities else None
+    results = run_job(args.job, cities, args.workers)
+    sys.exit(1 if any(r["status"] == "failed" for r in results) else 0)
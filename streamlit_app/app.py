@@ -1,62 +1,108 @@
 import streamlit as st
 import pandas as pd
-import plotly.graph_objects as go
+import numpy as np
 from datetime import datetime, timedelta, timezone
-from pymongo import MongoClient
-from mlflow.tracking import MlflowClient
 import os
+import sys
 from dotenv import load_dotenv
 
+# pymongo, plotly and mlflow are imported where they are first needed, so the
+# header and forecast cards are not held up by their import trees
+# (see startup_benchmark.py)
+
 load_dotenv()
 
+# The app runs from its own directory; the repo root is appended for the few
+# modules it shares with the pipelines (monitoring/model_metrics.py)
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.append(REPO_ROOT)
+
 # ==================== CONFIGURATION ====================
 MONGO_URI = os.getenv("MONGO_URI")
 MONGO_DB = os.getenv("MONGO_DB")
 MODEL_NAME = os.getenv("MODEL_NAME", "AQI_Forecast_Model")
 CITY = os.getenv("CITY", "Karachi")
+FEATURES_COLLECTION = os.getenv("MONGO_COLLECTION", "features_karachi_hourly")
+FORECASTS_COLLECTION = os.getenv("FORECASTS_COLLECTION", "aqi_forecasts")
+DASHBOARD_COLLECTION = os.getenv("DASHBOARD_COLLECTION", "dashboard_snapshots")
+SNAPSHOT_POLL_SECONDS = int(os.getenv("SNAPSHOT_POLL_SECONDS", 15))
+ROLLUPS_COLLECTION = os.getenv("ROLLUPS_COLLECTION", "aqi_rollups")
+HISTORY_POINT_BUDGET = int(os.getenv("HISTORY_POINT_BUDGET", 300))
+HISTORY_MAX_BUCKETS = int(os.getenv("HISTORY_MAX_BUCKETS", 1500))
+# Rollup resolutions written by feature_store/rollups.py, finest first
+RESOLUTION_HOURS = {"1h": 1, "6h": 6, "1d": 24}
 MLFLOW_TRACKING_URI = os.getenv("MLFLOW_TRACKING_URI")
 MLFLOW_TRACKING_USERNAME = os.getenv("MLFLOW_TRACKING_USERNAME")
 MLFLOW_TRACKING_PASSWORD = os.getenv("MLFLOW_TRACKING_PASSWORD")
 
-# MLflow setup
-os.environ["MLFLOW_TRACKING_USERNAME"] = MLFLOW_TRACKING_USERNAME
-os.environ["MLFLOW_TRACKING_PASSWORD"] = MLFLOW_TRACKING_PASSWORD
-
 # ==================== DATABASE CONNECTIONS ====================
 @st.cache_resource
 def get_mongo_client():
+    from pymongo import MongoClient
     return MongoClient(MONGO_URI)
 
 @st.cache_resource
 def get_mlflow_client():
     import mlflow
+    from mlflow.tracking import MlflowClient
+    # MLflow setup, only once the model metrics actually need it
+    if MLFLOW_TRACKING_USERNAME:
+        os.environ["MLFLOW_TRACKING_USERNAME"] = MLFLOW_TRACKING_USERNAME
+    if MLFLOW_TRACKING_PASSWORD:
+        os.environ["MLFLOW_TRACKING_PASSWORD"] = MLFLOW_TRACKING_PASSWORD
     mlflow.set_tracking_uri(MLFLOW_TRACKING_URI)
     return MlflowClient()
 
+# ==================== DASHBOARD SNAPSHOT ====================
+@st.cache_data(ttl=SNAPSHOT_POLL_SECONDS)
+def get_snapshot_version():
+    """Current snapshot version - answered from the (city, version) index alone"""
+    client = get_mongo_client()
+    doc = client[MONGO_DB][DASHBOARD_COLLECTION].find_one(
+        {"city": CITY}, {"_id": 0, "version": 1}
+    )
+    return doc["version"] if doc else None
+
+@st.cache_data(max_entries=2)
+def get_snapshot(version: int):
+    """The published snapshot; cached until the pipelines publish a new version"""
+    client = get_mongo_client()
+    return client[MONGO_DB][DASHBOARD_COLLECTION].find_one({"city": CITY}, {"_id": 0})
+
+def load_snapshot():
+    """Snapshot for CITY, or None before the pipelines have published one"""
+    version = get_snapshot_version()
+    return get_snapshot(version) if version is not None else None
+
 # ==================== DATA FETCHING FUNCTIONS ====================
+# Live queries, used until a snapshot section has been published
 @st.cache_data(ttl=60)  # Cache for 1 minute to see updates faster
 def get_forecasts():
-    """Get future AQI forecasts - deduplicates by taking the latest prediction per date"""
+    """Get future AQI forecasts - the latest issued forecast per date"""
     client = get_mongo_client()
     db = client[MONGO_DB]
-    preds_col = db["aqi_forecasts_daily"]
+    preds_col = db[FORECASTS_COLLECTION]
     
     tomorrow = pd.Timestamp.utcnow().normalize() + pd.Timedelta(days=1)
     
-    # Get all forecasts from tomorrow onwards
-    data = list(preds_col.find({"date": {"$gte": tomorrow}}, {"_id": 0, "date": 1, "avg_aqi": 1}))
+    # Superseded forecasts are flagged at write time, so this is one bounded
+    # scan of the (city, superseded, date) index
+    data = list(
+        preds_col.find(
+            {"city": CITY, "superseded": False, "date": {"$gte": tomorrow}},
+            {"_id": 0, "date": 1, "avg_aqi": 1}
+        )
+        .sort("date", 1)
+        .limit(3)
+    )
     
     if not data:
         return []
     
-    # Convert to DataFrame and deduplicate by date (keep last entry for each date)
     df = pd.DataFrame(data)
     df['date'] = pd.to_datetime(df['date'])
     
-    # Group by date and take the mean of avg_aqi to handle duplicates
-    df = df.groupby('date').agg({'avg_aqi': 'mean'}).reset_index()
-    df = df.sort_values('date')
-    
     return df.to_dict('records')
 
 @st.cache_data(ttl=60)
@@ -64,13 +110,13 @@ def get_history(days: int):
     """Get historical AQI data"""
     client = get_mongo_client()
     db = client[MONGO_DB]
-    features_col = db["features_karachi_hourly"]
+    features_col = db[FEATURES_COLLECTION]
     
     end = pd.Timestamp.utcnow().replace(tzinfo=timezone.utc)
     start = end - timedelta(days=days)
     
     data = list(features_col.find(
-        {"timestamp": {"$gte": start}},
+        {"city": CITY, "timestamp": {"$gte": start}},
         {"_id": 0, "timestamp": 1, "real_aqi": 1}
     ))
     
@@ -96,7 +142,7 @@ def get_today_avg_aqi():
     """Get today's average AQI"""
     client = get_mongo_client()
     db = client[MONGO_DB]
-    features_col = db["features_karachi_hourly"]
+    features_col = db[FEATURES_COLLECTION]
     
     now = pd.Timestamp.utcnow().replace(tzinfo=timezone.utc)
     start_of_today = now.normalize()
@@ -104,6 +150,7 @@ def get_today_avg_aqi():
     
     data = list(features_col.find(
         {
+            "city": CITY,
             "timestamp": {"$gte": start_of_today, "$lt": end_of_today},
             "real_aqi": {"$ne": None}
         },
@@ -129,41 +176,85 @@ def get_today_avg_aqi():
 
 @st.cache_data(ttl=600)
 def fetch_model_metrics():
-    client = get_mlflow_client()
-    versions = client.search_model_versions(f"name='{MODEL_NAME}'")
-    today = datetime.now(timezone.utc).date()
-    
-    production = None
-    others = []
-    
-    for v in versions:
-        run = client.get_run(v.run_id)
-        run_start = datetime.fromtimestamp(run.info.start_time / 1000, tz=timezone.utc).date()
-        
-        if run_start != today:
-            continue
-        
-        metrics = run.data.metrics
-        
-        info = {
-            "version": int(v.version),
-            "run_name": run.data.tags.get("mlflow.runName"),
-            "stage": v.current_stage,
-            "mae_24h": metrics.get("MAE_24h"),
-            "mae_48h": metrics.get("MAE_48h"),
-            "mae_72h": metrics.get("MAE_72h"),
-            "rmse_24h": metrics.get("RMSE_24h"),
-            "rmse_48h": metrics.get("RMSE_48h"),
-            "rmse_72h": metrics.get("RMSE_72h"),
-            "rmse_avg": metrics.get("RMSE_avg"),
-        }
-        
-        if v.current_stage == "Production":
-            production = info
-        else:
-            others.append(info)
+    """Today's registered candidates and their metrics (shared with the snapshot publisher)"""
+    from monitoring.model_metrics import todays_model_metrics
+    table = todays_model_metrics(get_mlflow_client(), MODEL_NAME)
+    return table["production"], table["others"]
+
+def upcoming_forecasts(snapshot):
+    """Snapshot forecast for the days after today, or the live query once a published day has become today"""
+    if "forecast" not in snapshot:
+        return get_forecasts()
+    today = datetime.now(timezone.utc).date().isoformat()
+    upcoming = [f for f in snapshot["forecast"] if f["date"] > today]
+    if len(upcoming) < len(snapshot["forecast"]):
+        return get_forecasts()
+    return upcoming
+
+# ==================== LONG-RANGE HISTORY ====================
+def pick_resolution(days: int, requested=None):
+    """
+    Finest rollup whose bucket count for the range stays within
+    HISTORY_MAX_BUCKETS. A requested resolution is kept if it is coarser,
+    so a manual "1h" over a year reads 6h buckets instead of 8760 docs.
+    """
+    for resolution, hours in RESOLUTION_HOURS.items():
+        if days * 24 / hours <= HISTORY_MAX_BUCKETS:
+            if requested is not None and RESOLUTION_HOURS[requested] > hours:
+                return requested
+            return resolution
+    return "1d"
+
+def lttb(x, y, n_out):
+    """Largest-Triangle-Three-Buckets: indices of n_out points that keep the series' visual shape"""
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    
+    # First and last points are kept; the rest are split into n_out - 2 buckets
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    idx = np.empty(n_out, dtype=int)
+    idx[0], idx[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, stop = edges[i], edges[i + 1]
+        next_stop = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[stop:next_stop].mean()
+        avg_y = y[stop:next_stop].mean()
+        # Keep the point forming the largest triangle with the last kept point and the next bucket's mean
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:stop] - y[a])
+            - (x[a] - x[start:stop]) * (avg_y - y[a])
+        )
+        a = start + int(area.argmax())
+        idx[i + 1] = a
+    return idx
+
+@st.cache_data(max_entries=32)
+def get_long_history(days: int, resolution: str, version):
+    """
+    Downsampled rollups for the last `days` days. `version` is the snapshot
+    version, bumped by ingestion right after it refreshes the rollups.
+    """
+    client = get_mongo_client()
+    rollups_col = client[MONGO_DB][ROLLUPS_COLLECTION]
+    start = pd.Timestamp.utcnow().floor("h") - pd.Timedelta(days=days)
+    
+    data = list(
+        rollups_col.find(
+            {"city": CITY, "resolution": resolution, "bucket": {"$gte": start}},
+            {"_id": 0, "bucket": 1, "mean": 1, "min": 1, "max": 1}
+        ).sort("bucket", 1)
+    )
+    if not data:
+        return {"points": [], "buckets": 0}
     
-    return production, others
+    df = pd.DataFrame(data)
+    df["bucket"] = pd.to_datetime(df["bucket"], utc=True)
+    x = df["bucket"].astype("int64").to_numpy(dtype=float)
+    keep = lttb(x, df["mean"].to_numpy(dtype=float), HISTORY_POINT_BUDGET)
+    points = df.iloc[keep].round({"mean": 2, "min": 2, "max": 2})
+    return {"points": points.to_dict("records"), "buckets": len(df)}
 
 # ==================== UTILITY FUNCTIONS ====================
 def get_aqi_color(aqi):
@@ -212,6 +303,261 @@ def get_aqi_gradient(aqi):
         return "linear-gradient(135deg, #a855f7 0%, #9333ea 100%)"
     return "linear-gradient(135deg, #7f1d1d 0%, #450a0a 100%)"
 
+# ==================== LAZY SECTIONS ====================
+# Each section is a fragment: the page above it is already on screen while it
+# loads, and its widgets rerun only the section instead of the whole script
+fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", lambda fn: fn)
+
+@fragment
+def render_model_metrics(snapshot):
+    # Model Performance
+    st.markdown(f'<h3> 🤖 ML Model Performance Metrics', unsafe_allow_html=True)
+    try:
+        if "models" in snapshot:
+            production, others = snapshot["models"]["production"], snapshot["models"]["others"]
+        else:
+            with st.spinner("Loading model metrics..."):
+                production, others = fetch_model_metrics()
+        
+        if production:
+            st.markdown(f"""
+            <div class="production-box">
+                🚀 Forecasts powered by <span>{production['run_name']}</span> — 
+                our production model with lowest error metrics
+            </div>
+            """, unsafe_allow_html=True)
+            
+            all_models = [production] + others
+            df_models = pd.DataFrame(all_models)
+            
+            df_models = df_models[[
+                'version', 'run_name', 'stage',
+                'mae_24h', 'mae_48h', 'mae_72h',
+                'rmse_24h', 'rmse_48h', 'rmse_72h', 'rmse_avg'
+            ]]
+            
+            metric_cols = ['mae_24h', 'mae_48h', 'mae_72h', 'rmse_24h', 'rmse_48h', 'rmse_72h', 'rmse_avg']
+            for col in metric_cols:
+                df_models[col] = df_models[col].round(2)
+            
+            df_models.columns = [
+                'Version', 'Model Name', 'Stage',
+                'MAE 24h', 'MAE 48h', 'MAE 72h',
+                'RMSE 24h', 'RMSE 48h', 'RMSE 72h', 'Avg RMSE'
+            ]
+            
+            st.dataframe(
+                df_models,
+                use_container_width=True,
+                hide_index=True,
+                height=min(len(df_models) * 35 + 38, 400)
+            )
+        else:
+            st.warning("⚠️ No production model metrics available for today")
+    except Exception as e:
+        st.error(f"Error loading model metrics: {e}")
+
+    # Live accuracy: published forecasts scored against the observed daily mean
+    # (pipelines/accuracy_pipeline.py), read from the snapshot
+    if snapshot.get("accuracy"):
+        st.markdown("**Live accuracy** — published forecasts vs. observed daily mean AQI")
+        df_acc = pd.DataFrame(snapshot["accuracy"])[["model_version", "horizon", "scored", "mae", "rmse", "bias"]]
+        df_acc["horizon"] = df_acc["horizon"].astype(str) + "h"
+        df_acc.columns = ["Version", "Horizon", "Forecasts Scored", "MAE", "RMSE", "Bias"]
+        st.dataframe(df_acc, use_container_width=True, hide_index=True)
+
+@fragment
+def render_trend_chart(snapshot, today_data, forecasts):
+    import plotly.graph_objects as go
+    
+    # 7-Day Chart (3 history + today + 3 forecast)
+    st.markdown(f'<h3> 📈 7-Day AQI Trend (Historical & Forecast)', unsafe_allow_html=True)
+
+    try:
+        # Get 3 days of history
+        if "history" in snapshot:
+            history_df = pd.DataFrame(snapshot["history"][-3:])
+        else:
+            history_df = pd.DataFrame(get_history(3)["history"])
+        
+        if not history_df.empty:
+            history_df["date"] = pd.to_datetime(history_df["date"])
+            history_df["type"] = "Historical"
+            history_df = history_df.rename(columns={"real_aqi": "AQI"})
+        
+        # Get forecast data (should have 3 future days)
+        forecast_df = pd.DataFrame(forecasts[:3])  # Only take first 3 forecasts
+        if not forecast_df.empty:
+            forecast_df["date"] = pd.to_datetime(forecast_df["date"])
+            forecast_df["type"] = "Forecast"
+            forecast_df = forecast_df.rename(columns={"avg_aqi": "AQI"})
+        
+        # Add today's data
+        today_df = pd.DataFrame([{
+            "date": pd.to_datetime(today_data["date"]),
+            "AQI": today_data.get("avg_aqi"),
+            "type": "Today"
+        }]) if today_data.get("avg_aqi") else pd.DataFrame()
+        
+        # Combine all data
+        combined_df = pd.concat([history_df, today_df, forecast_df], ignore_index=True)
+        combined_df = combined_df.drop_duplicates(subset=['date'], keep='last')
+        combined_df = combined_df.sort_values("date").reset_index(drop=True)
+        
+        # Create chart
+        fig = go.Figure()
+        
+        # Single continuous line connecting all points
+        fig.add_trace(go.Scatter(
+            x=combined_df["date"],
+            y=combined_df["AQI"],
+            mode='lines+markers',
+            name='AQI Trend',
+            line=dict(color='#38bdf8', width=3, shape='spline'),
+            marker=dict(size=8, color='#38bdf8', line=dict(width=2, color='#0c4a6e')),
+            hovertemplate='<b>%{x|%a, %b %d}</b><br>AQI: <b>%{y:.1f}</b><extra></extra>',
+        ))
+        
+        # Highlight today
+        today_point = combined_df[combined_df["type"] == "Today"]
+        if not today_point.empty:
+            fig.add_trace(go.Scatter(
+                x=today_point["date"],
+                y=today_point["AQI"],
+                mode='markers',
+                name='Today',
+                marker=dict(size=14, color='#10b981', symbol='circle', line=dict(width=3, color='#ffffff')),
+                hovertemplate='<b>TODAY</b><br>%{x|%a, %b %d}<br>AQI: <b>%{y:.1f}</b><extra></extra>',
+            ))
+        
+        # Highlight forecast points
+        forecast_point = combined_df[combined_df["type"] == "Forecast"]
+        if not forecast_point.empty:
+            fig.add_trace(go.Scatter(
+                x=forecast_point["date"],
+                y=forecast_point["AQI"],
+                mode='markers',
+                name='Forecast',
+                marker=dict(size=10, color='#a78bfa', symbol='diamond', line=dict(width=2, color='#5b21b6')),
+                hovertemplate='<b>Forecast</b><br>%{x|%a, %b %d}<br>AQI: <b>%{y:.1f}</b><extra></extra>',
+            ))
+        
+        # Layout
+        fig.update_layout(
+            height=500,
+            hovermode='x unified',
+            plot_bgcolor='rgba(0,0,0,0)',
+            paper_bgcolor='rgba(0,0,0,0)',
+            font=dict(color='#e2e8f0', family='Inter', size=13),
+            xaxis=dict(
+                showgrid=True,
+                gridcolor='rgba(148,163,184,0.08)',
+                gridwidth=1,
+                title=None,
+                tickfont=dict(size=12, color='#475569'),
+                showline=True,
+                linecolor='rgba(148, 163, 184, 0.2)',
+                linewidth=2
+            ),
+            yaxis=dict(
+                showgrid=True,
+                gridcolor='rgba(148, 163, 184, 0.1)',
+                gridwidth=1,
+                title=dict(
+                    text='AQI Value',
+                    font=dict(size=14, color='#475569')
+                ),
+                tickfont=dict(size=12, color='#475569'),
+                showline=True,
+                linecolor='rgba(148, 163, 184, 0.2)',
+                linewidth=2
+            ),
+            legend=dict(
+                orientation="h",
+                yanchor="bottom",
+                y=1.02,
+                xanchor="right",
+                x=1,
+                bgcolor='rgba(15, 23, 42, 0.8)',
+                bordercolor='rgba(148, 163, 184, 0.2)',
+                borderwidth=1,
+                font=dict(size=13, color='#e2e8f0')
+            ),
+            margin=dict(l=60, r=40, t=40, b=60),
+            hoverlabel=dict(
+                bgcolor='rgba(15, 23, 42, 0.95)',
+                font_size=13,
+                font_family='Inter',
+                bordercolor='#38bdf8'
+            )
+        )
+        
+        st.plotly_chart(fig, use_container_width=True)
+        
+    except Exception as e:
+        st.error(f"❌ Error creating visualization: {e}")
+        import traceback
+        st.code(traceback.format_exc())
+
+@fragment
+def render_long_history():
+    import plotly.graph_objects as go
+    
+    # Long-range history from the rollups, downsampled to a fixed point budget
+    st.markdown(f'<h3> 🗓️ Long-Range AQI History', unsafe_allow_html=True)
+    try:
+        range_col, resolution_col = st.columns([3, 1])
+        with range_col:
+            days = st.radio(
+                "Range", [30, 90, 365], horizontal=True,
+                format_func=lambda d: f"{d} days", label_visibility="collapsed"
+            )
+        with resolution_col:
+            choice = st.selectbox(
+                "Resolution", ["Auto", "1h", "6h", "1d"], label_visibility="collapsed"
+            )
+        resolution = pick_resolution(days, None if choice == "Auto" else choice)
+        
+        long_history = get_long_history(days, resolution, get_snapshot_version())
+        long_df = pd.DataFrame(long_history["points"])
+        
+        if long_df.empty:
+            st.info("No long-range history available yet")
+        else:
+            fig = go.Figure()
+            fig.add_trace(go.Scatter(
+                x=long_df["bucket"],
+                y=long_df["mean"],
+                customdata=long_df[["min", "max"]],
+                mode='lines',
+                name='AQI',
+                line=dict(color='#38bdf8', width=2),
+                hovertemplate='<b>%{x|%b %d, %Y %H:%M}</b><br>AQI: <b>%{y:.1f}</b>'
+                              '<br>Range: %{customdata[0]:.0f} – %{customdata[1]:.0f}<extra></extra>',
+            ))
+            fig.update_layout(
+                height=400,
+                plot_bgcolor='rgba(0,0,0,0)',
+                paper_bgcolor='rgba(0,0,0,0)',
+                font=dict(color='#e2e8f0', family='Inter', size=13),
+                xaxis=dict(showgrid=True, gridcolor='rgba(148,163,184,0.08)', tickfont=dict(size=12, color='#475569')),
+                yaxis=dict(
+                    showgrid=True, gridcolor='rgba(148, 163, 184, 0.1)',
+                    title=dict(text='AQI Value', font=dict(size=14, color='#475569')),
+                    tickfont=dict(size=12, color='#475569')
+                ),
+                showlegend=False,
+                margin=dict(l=60, r=40, t=20, b=40)
+            )
+            st.plotly_chart(fig, use_container_width=True)
+            st.caption(
+                f"{resolution} buckets • {len(long_df)} of {long_history['buckets']} points shown"
+                + (f" • {choice} is too fine for {days} days" if choice not in ("Auto", resolution) else "")
+            )
+    except Exception as e:
+        st.error(f"Error loading long-range history: {e}")
+
+
 # ==================== STREAMLIT APP ====================
 def main():
     st.set_page_config(
@@ -557,8 +903,9 @@ def main():
     
     # Fetch data
     try:
-        today_data = get_today_avg_aqi()
-        forecasts = get_forecasts()
+        snapshot = load_snapshot() or {}
+        today_data = snapshot.get("today") or get_today_avg_aqi()
+        forecasts = upcoming_forecasts(snapshot)
     except Exception as e:
         st.error(f"Error fetching data: {e}")
         return
@@ -652,175 +999,9 @@ def main():
             </div>
             """, unsafe_allow_html=True)
     
-    # Model Performance
-    st.markdown(f'<h3> 🤖 ML Model Performance Metrics', unsafe_allow_html=True)
-    try:
-        production, others = fetch_model_metrics()
-        
-        if production:
-            st.markdown(f"""
-            <div class="production-box">
-                🚀 Forecasts powered by <span>{production['run_name']}</span> — 
-                our production model with lowest error metrics
-            </div>
-            """, unsafe_allow_html=True)
-            
-            all_models = [production] + others
-            df_models = pd.DataFrame(all_models)
-            
-            df_models = df_models[[
-                'version', 'run_name', 'stage',
-                'mae_24h', 'mae_48h', 'mae_72h',
-                'rmse_24h', 'rmse_48h', 'rmse_72h', 'rmse_avg'
-            ]]
-            
-            metric_cols = ['mae_24h', 'mae_48h', 'mae_72h', 'rmse_24h', 'rmse_48h', 'rmse_72h', 'rmse_avg']
-            for col in metric_cols:
-                df_models[col] = df_models[col].round(2)
-            
-            df_models.columns = [
-                'Version', 'Model Name', 'Stage',
-                'MAE 24h', 'MAE 48h', 'MAE 72h',
-                'RMSE 24h', 'RMSE 48h', 'RMSE 72h', 'Avg RMSE'
-            ]
-            
-            st.dataframe(
-                df_models,
-                use_container_width=True,
-                hide_index=True,
-                height=min(len(df_models) * 35 + 38, 400)
-            )
-        else:
-            st.warning("⚠️ No production model metrics available for today")
-    except Exception as e:
-        st.error(f"Error loading model metrics: {e}")
-    
-    # 7-Day Chart (3 history + today + 3 forecast)
-    st.markdown(f'<h3> 📈 7-Day AQI Trend (Historical & Forecast)', unsafe_allow_html=True)
-
-    try:
-        # Get 3 days of history
-        history_data = get_history(3)
-        history_df = pd.DataFrame(history_data["history"])
-        
-        if not history_df.empty:
-            history_df["date"] = pd.to_datetime(history_df["date"])
-            history_df["type"] = "Historical"
-            history_df = history_df.rename(columns={"real_aqi": "AQI"})
-        
-        # Get forecast data (should have 3 future days)
-        forecast_df = pd.DataFrame(forecasts[:3])  # Only take first 3 forecasts
-        if not forecast_df.empty:
-            forecast_df["date"] = pd.to_datetime(forecast_df["date"])
-            forecast_df["type"] = "Forecast"
-            forecast_df = forecast_df.rename(columns={"avg_aqi": "AQI"})
-        
-        # Add today's data
-        today_df = pd.DataFrame([{
-            "date": pd.to_datetime(today_data["date"]),
-            "AQI": today_data.get("avg_aqi"),
-            "type": "Today"
-        }]) if today_data.get("avg_aqi") else pd.DataFrame()
-        
-        # Combine all data
-        combined_df = pd.concat([history_df, today_df, forecast_df], ignore_index=True)
-        combined_df = combined_df.drop_duplicates(subset=['date'], keep='last')
-        combined_df = combined_df.sort_values("date").reset_index(drop=True)
-        
-        # Create chart
-        fig = go.Figure()
-        
-        # Single continuous line connecting all points
-        fig.add_trace(go.Scatter(
-            x=combined_df["date"],
-            y=combined_df["AQI"],
-            mode='lines+markers',
-            name='AQI Trend',
-            line=dict(color='#38bdf8', width=3, shape='spline'),
-            marker=dict(size=8, color='#38bdf8', line=dict(width=2, color='#0c4a6e')),
-            hovertemplate='<b>%{x|%a, %b %d}</b><br>AQI: <b>%{y:.1f}</b><extra></extra>',
-        ))
-        
-        # Highlight today
-        today_point = combined_df[combined_df["type"] == "Today"]
-        if not today_point.empty:
-            fig.add_trace(go.Scatter(
-                x=today_point["date"],
-                y=today_point["AQI"],
-                mode='markers',
-                name='Today',
-                marker=dict(size=14, color='#10b981', symbol='circle', line=dict(width=3, color='#ffffff')),
-                hovertemplate='<b>TODAY</b><br>%{x|%a, %b %d}<br>AQI: <b>%{y:.1f}</b><extra></extra>',
-            ))
-        
-        # Highlight forecast points
-        forecast_point = combined_df[combined_df["type"] == "Forecast"]
-        if not forecast_point.empty:
-            fig.add_trace(go.Scatter(
-                x=forecast_point["date"],
-                y=forecast_point["AQI"],
-                mode='markers',
-                name='Forecast',
-                marker=dict(size=10, color='#a78bfa', symbol='diamond', line=dict(width=2, color='#5b21b6')),
-                hovertemplate='<b>Forecast</b><br>%{x|%a, %b %d}<br>AQI: <b>%{y:.1f}</b><extra></extra>',
-            ))
-        
-        # Layout
-        fig.update_layout(
-            height=500,
-            hovermode='x unified',
-            plot_bgcolor='rgba(0,0,0,0)',
-            paper_bgcolor='rgba(0,0,0,0)',
-            font=dict(color='#e2e8f0', family='Inter', size=13),
-            xaxis=dict(
-                showgrid=True,
-                gridcolor='rgba(148,163,184,0.08)',
-                gridwidth=1,
-                title=None,
-                tickfont=dict(size=12, color='#475569'),
-                showline=True,
-                linecolor='rgba(148, 163, 184, 0.2)',
-                linewidth=2
-            ),
-            yaxis=dict(
-                showgrid=True,
-                gridcolor='rgba(148, 163, 184, 0.1)',
-                gridwidth=1,
-                title=dict(
-                    text='AQI Value',
-                    font=dict(size=14, color='#475569')
-                ),
-                tickfont=dict(size=12, color='#475569'),
-                showline=True,
-                linecolor='rgba(148, 163, 184, 0.2)',
-                linewidth=2
-            ),
-            legend=dict(
-                orientation="h",
-                yanchor="bottom",
-                y=1.02,
-                xanchor="right",
-                x=1,
-                bgcolor='rgba(15, 23, 42, 0.8)',
-                bordercolor='rgba(148, 163, 184, 0.2)',
-                borderwidth=1,
-                font=dict(size=13, color='#e2e8f0')
-            ),
-            margin=dict(l=60, r=40, t=40, b=60),
-            hoverlabel=dict(
-                bgcolor='rgba(15, 23, 42, 0.95)',
-                font_size=13,
-                font_family='Inter',
-                bordercolor='#38bdf8'
-            )
-        )
-        
-        st.plotly_chart(fig, use_container_width=True)
-        
-    except Exception as e:
-        st.error(f"❌ Error creating visualization: {e}")
-        import traceback
-        st.code(traceback.format_exc())
+    render_model_metrics(snapshot)
+    render_trend_chart(snapshot, today_data, forecasts)
+    render_long_history()
     
     # Footer
     st.markdown("<br><br>", unsafe_allow_html=True)
@@ -0,0 +1,193 @@
+"""
+Cold-start benchmark for the dashboard.
+
+Two measurements, each in fresh interpreters and compared with a baseline
+that only loads streamlit + pandas:
+
+  import        `import app`, what Streamlit does before anything is drawn.
+                Fails if it pulls in a deferred heavy module.
+  first render  one full script run through streamlit.testing.v1.AppTest,
+                i.e. the imports plus every query and panel of the first
+                page. Fails if the page shows an error.
+
+The render reads the database configured for the app (MONGO_URI / MONGO_DB,
+.env included). --seed writes a small published snapshot and 30 days of
+hourly rollups first, for a throwaway database such as the one CI starts
+(.github/workflows/dashboard_startup.yml); it refuses to touch a database
+that already has a snapshot for CITY.
+
+    cd streamlit_app
+    python startup_benchmark.py --runs 5 --budget-ms 250 --render-budget-ms 1500
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from datetime import datetime, timedelta, timezone
+from dotenv import load_dotenv
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Only the panels that need these may import them
+DEFERRED = ("mlflow", "plotly", "pymongo")
+
+BASELINE = "import streamlit, pandas, numpy, dotenv"
+APP = "import app"
+
+PROBE = """
+import json, sys, time
+t = time.perf_counter()
+{stmt}
+elapsed = time.perf_counter() - t
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {deferred!r} if m in sys.modules]}}))
+"""
+
+RENDER_PROBE = """
+import json, time
+from streamlit.testing.v1 import AppTest
+at = {factory}
+t = time.perf_counter()
+at.run(timeout={timeout})
+elapsed = time.perf_counter() - t
+errors = [e.value for e in at.error] + [e.message for e in at.exception]
+print(json.dumps({{"seconds": elapsed, "errors": errors}}))
+"""
+
+BASELINE_RENDER = 'AppTest.from_string("import streamlit as st, pandas, numpy, dotenv\\nst.write(\\"baseline\\")")'
+APP_RENDER = 'AppTest.from_file("app.py")'
+
+def run_probe(args, label):
+    """Run a probe interpreter; a failure is reported as what couldn't run, with its error"""
+    try:
+        return subprocess.run(args, cwd=HERE, capture_output=True, text=True, check=True)
+    except subprocess.CalledProcessError as e:
+        lines = (e.stderr or e.stdout or "").strip().splitlines()
+        detail = lines[-1] if lines else f"exit code {e.returncode}"
+        sys.exit(f"FAIL: could not run the {label}: {detail}\n"
+                 f"(are streamlit_app/requirements.txt installed in {sys.executable}?)")
+
+def measure(stmt, label):
+    """Import time of `stmt` in a fresh interpreter, plus deferred modules it loaded"""
+    out = run_probe([sys.executable, "-c", PROBE.format(stmt=stmt, deferred=DEFERRED)], label)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def measure_render(factory, label, timeout):
+    """Duration of one full script run in a fresh interpreter, plus the errors it showed"""
+    out = run_probe([sys.executable, "-c", RENDER_PROBE.format(factory=factory, timeout=timeout)], label)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def slowest_imports(stmt, top_n):
+    """Cumulative import times from -X importtime, slowest first"""
+    out = run_probe([sys.executable, "-X", "importtime", "-c", stmt], f"import profile of `{stmt}`")
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Top-level packages only; nested imports are already in their parent's time
+        if not name.startswith("  "):
+            rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:top_n]
+
+def seed_fixture():
+    """Published snapshot + hourly rollups for CITY, in the same shape the pipelines write"""
+    from pymongo import MongoClient
+
+    # Same settings and defaults as app.py
+    db = MongoClient(os.getenv("MONGO_URI"))[os.getenv("MONGO_DB")]
+    city = os.getenv("CITY", "Karachi")
+    snapshots = db[os.getenv("DASHBOARD_COLLECTION", "dashboard_snapshots")]
+    rollups = db[os.getenv("ROLLUPS_COLLECTION", "aqi_rollups")]
+
+    if snapshots.find_one({"city": city}, {"_id": 1}):
+        sys.exit(f"FAIL: {db.name} already has a snapshot for {city}; --seed is for an empty database")
+
+    now = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    today = now.date()
+    metrics = {f"{m}_{h}": 10.0 + i for i, m in enumerate(("mae", "rmse")) for h in ("24h", "48h", "72h")}
+
+    snapshots.insert_one({
+        "city": city,
+        "version": 1,
+        "today": {"date": today.isoformat(), "avg_aqi": 110.0, "hours_recorded": now.hour + 1},
+        "history": [{"date": (today - timedelta(days=d)).isoformat(), "real_aqi": 100.0 + d} for d in range(7, 0, -1)],
+        "forecast": [
+            {"date": (today + timedelta(days=d)).isoformat(), "avg_aqi": 120.0 + d, "model_version": 2}
+            for d in range(1, 4)
+        ],
+        "models": {
+            "production": {"version": 2, "run_name": "XGBoost_AQI_Forecast", "stage": "Production", **metrics, "rmse_avg": 11.0},
+            "others": [{"version": 1, "run_name": "Ridge_AQI_Forecast", "stage": "None", **metrics, "rmse_avg": 12.0}]
+        },
+        "accuracy": [
+            {"model_version": 2, "horizon": h, "scored": 30, "mae": 9.0, "rmse": 11.0, "bias": 1.0}
+            for h in (24, 48, 72)
+        ],
+        "updated_at": now
+    })
+    rollups.insert_many([
+        {"city": city, "resolution": "1h", "bucket": now - timedelta(hours=h),
+         "mean": 100.0 + h % 24, "min": 90.0, "max": 130.0, "n": 1}
+        for h in range(30 * 24)
+    ])
+    print(f"Seeded {db.name} with a snapshot and 30 days of hourly rollups for {city}\n")
+
+def run_benchmark(runs, budget_ms, render_budget_ms, timeout, top_n=10):
+    baseline_runs = [measure(BASELINE, f"baseline `{BASELINE}`") for _ in range(runs)]
+    baseline = statistics.median(r["seconds"] for r in baseline_runs)
+    app_runs = [measure(APP, "app import") for _ in range(runs)]
+    app = statistics.median(r["seconds"] for r in app_runs)
+    overhead_ms = (app - baseline) * 1000
+    # Newer streamlit releases load plotly themselves; only what app.py adds counts
+    loaded = sorted(
+        {m for r in app_runs for m in r["loaded"]} - {m for r in baseline_runs for m in r["loaded"]}
+    )
+
+    render_base = statistics.median(
+        measure_render(BASELINE_RENDER, "baseline render", timeout)["seconds"] for _ in range(runs)
+    )
+    render_runs = [measure_render(APP_RENDER, "first render of app.py", timeout) for _ in range(runs)]
+    render = statistics.median(r["seconds"] for r in render_runs)
+    render_overhead_ms = (render - render_base) * 1000
+    errors = sorted({e for r in render_runs for e in r["errors"]})
+
+    print(f"streamlit + pandas baseline: {baseline * 1000:8.1f} ms (median of {runs})")
+    print(f"import app:                  {app * 1000:8.1f} ms (median of {runs})")
+    print(f"app overhead:                {overhead_ms:8.1f} ms (budget {budget_ms} ms)")
+    print(f"\nbaseline script run:         {render_base * 1000:8.1f} ms (median of {runs})")
+    print(f"first render of app.py:      {render * 1000:8.1f} ms (median of {runs})")
+    print(f"render overhead:             {render_overhead_ms:8.1f} ms (budget {render_budget_ms} ms)")
+    print("\nSlowest top-level imports of app.py:")
+    for us, name in slowest_imports(APP, top_n):
+        print(f"  {us / 1000:8.1f} ms  {name}")
+
+    failures = []
+    if loaded:
+        failures.append(f"deferred modules imported at startup: {', '.join(loaded)}")
+    if overhead_ms > budget_ms:
+        failures.append(f"app import overhead {overhead_ms:.1f} ms exceeds the {budget_ms} ms budget")
+    if errors:
+        # A page that failed early isn't a first render worth timing
+        failures.append("first render showed errors (is MONGO_URI / MONGO_DB reachable?): " + "; ".join(errors))
+    if render_overhead_ms > render_budget_ms:
+        failures.append(f"first render overhead {render_overhead_ms:.1f} ms exceeds the {render_budget_ms} ms budget")
+    for f in failures:
+        print(f"FAIL: {f}")
+    return not failures
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the dashboard's cold start and first render")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("STARTUP_BUDGET_MS", 250)))
+    parser.add_argument("--render-budget-ms", type=float, default=float(os.getenv("STARTUP_RENDER_BUDGET_MS", 1500)))
+    parser.add_argument("--timeout", type=float, default=60, help="seconds allowed for one script run")
+    parser.add_argument("--seed", action="store_true", help="seed an empty database with a snapshot and rollups first")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    load_dotenv()
+    if args.seed:
+        seed_fixture()
+    sys.exit(0 if run_benchmark(args.runs, args.budget_ms, args.render_budget_ms, args.timeout, args.top) else 1)